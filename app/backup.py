@@ -0,0 +1,372 @@
+"""
+整库备份与恢复（gzip 压缩的 NDJSON 流）
+
+文件内容为逐行 JSON：
+    {"manifest": {...}}                              首行清单：格式版本、生成时间、包含的表
+    {"table": "students", "columns": [...], "count": N}  每张表的表头
+    {"table": "students", "row": {...}}              表中的每一行（保留原始 id）
+    {"end": true}                                    结束标记，缺失说明文件被截断
+
+各表按 yield_per 分批读取、逐块压缩，内存占用与数据量无关。student_scores、exam_stats、
+exams 等可由 students 重新计算的派生表及 jobs 任务表不做备份，派生表在恢复时重建。
+"""
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import tempfile
+import zlib
+from datetime import date, datetime
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Date, DateTime, Table, UniqueConstraint, delete, func, select, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from . import models, range_config
+from .bulk_import import replace_score_items
+from .class_catalog import sync_classes
+from .exam_catalog import sync_exams
+from .database import Base, SessionLocal, begin_read_snapshot
+from .grade_stats import rebuild_exam_stats
+
+FORMAT_NAME = "grade-manager-ndjson"
+TOTAL_SUBJECT = "总分"
+FORMAT_VERSION = 1
+
+# 可由 students 重新计算的派生表
+DERIVED_TABLES = {
+    models.StudentScore.__tablename__,
+    models.ExamStat.__tablename__,
+    models.Exam.__tablename__,
+}
+
+# 运行期状态表，不属于业务数据
+RUNTIME_TABLES = {
+    models.Job.__tablename__,
+}
+
+# 每批读取的行数，以及攒够多少字节再压缩输出一次
+_BATCH_SIZE = 1000
+_FLUSH_BYTES = 256 * 1024
+# 压缩结果在内存中暂存的上限，超过后写入磁盘临时文件
+_SPOOL_MEMORY = 16 * 1024 * 1024
+
+
+def backup_tables() -> List[str]:
+    """可备份的表，按外键依赖排序（被引用的表在前）"""
+    excluded = DERIVED_TABLES | RUNTIME_TABLES
+    return [table.name for table in Base.metadata.sorted_tables if table.name not in excluded]
+
+
+def resolve_tables(names: Optional[Sequence[str]]) -> List[str]:
+    """校验并按依赖顺序排列要备份的表，names 为空时返回全部；存在未知表名时抛出 ValueError"""
+    available = backup_tables()
+    if not names:
+        return available
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(", ".join(unknown))
+    return [name for name in available if name in set(names)]
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+def _line(payload: Dict[str, Any]) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, default=_json_default).encode("utf-8") + b"\n"
+
+
+def iter_backup(table_names: Sequence[str]) -> Iterator[bytes]:
+    """逐块产出 gzip 压缩后的备份内容
+
+    全部表在同一个读事务中导出，保证表间数据一致。压缩结果先写入临时文件，读事务结束后
+    再输出，客户端下载慢时不会一直持有读锁阻塞其他写入。
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 输出 gzip 格式
+    buffer = bytearray()
+    spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MEMORY)
+
+    def flush() -> None:
+        spool.write(compressor.compress(bytes(buffer)))
+        buffer.clear()
+
+    tables = {table.name: table for table in Base.metadata.sorted_tables}
+    try:
+        with SessionLocal() as db:
+            begin_read_snapshot(db)
+            buffer += _line({
+                "manifest": {
+                    "format": FORMAT_NAME,
+                    "version": FORMAT_VERSION,
+                    "created_at": datetime.utcnow().isoformat(),
+                    "tables": list(table_names),
+                }
+            })
+            for name in table_names:
+                table = tables[name]
+                count = db.execute(select(func.count()).select_from(table)).scalar() or 0
+                buffer += _line({"table": name, "columns": [column.name for column in table.columns], "count": count})
+                result = db.execute(
+                    select(table).order_by(*table.primary_key.columns).execution_options(yield_per=_BATCH_SIZE)
+                )
+                for row in result.mappings():
+                    buffer += _line({"table": name, "row": dict(row)})
+                    if len(buffer) >= _FLUSH_BYTES:
+                        flush()
+            buffer += _line({"end": True})
+        # 会话关闭时回滚，读事务到此结束
+        flush()
+        spool.write(compressor.flush())
+
+        spool.seek(0)
+        while True:
+            chunk = spool.read(_FLUSH_BYTES)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        spool.close()
+
+
+# ==================== 恢复 ====================
+
+# 每个事务写入的行数
+_RESTORE_CHUNK = 2000
+
+
+class RestoreError(ValueError):
+    """备份文件格式不正确"""
+
+
+def _open_lines(fileobj: BinaryIO) -> Iterator[str]:
+    """逐行读取上传的备份文件，自动识别 gzip 压缩"""
+    fileobj.seek(0)
+    magic = fileobj.read(2)
+    fileobj.seek(0)
+    raw = gzip.GzipFile(fileobj=fileobj, mode="rb") if magic == b"\x1f\x8b" else fileobj
+    reader = io.TextIOWrapper(raw, encoding="utf-8")
+    try:
+        for line in reader:
+            if line.strip():
+                yield line
+    finally:
+        # 不随读取器关闭上传文件，冲突检查后还要从头再读一遍；文件已被调用方关闭时无需处理
+        if not fileobj.closed:
+            reader.detach()
+
+
+def _converters(table: Table) -> Dict[str, Callable[[Any], Any]]:
+    """NDJSON 中日期时间为 ISO 字符串，写入前还原为 Python 对象"""
+    converters: Dict[str, Callable[[Any], Any]] = {}
+    for column in table.columns:
+        if isinstance(column.type, DateTime):
+            converters[column.name] = datetime.fromisoformat
+        elif isinstance(column.type, Date):
+            converters[column.name] = date.fromisoformat
+    return converters
+
+
+def _unique_keys(table: Table) -> List[Tuple[str, ...]]:
+    keys = [tuple(column.name for column in constraint.columns)
+            for constraint in table.constraints if isinstance(constraint, UniqueConstraint)]
+    keys.extend((column.name,) for column in table.columns if column.unique)
+    return keys
+
+
+def _delete_conflicting(db: Session, table: Table, rows: List[Dict[str, Any]]) -> None:
+    """删除与备份行唯一键相同但 id 不同的现有行，由备份中的记录取而代之"""
+    for key in _unique_keys(table):
+        wanted = {
+            tuple(row[column] for column in key): row["id"]
+            for row in rows
+            if all(row.get(column) is not None for column in key)
+        }
+        if not wanted:
+            continue
+        columns = [table.c[column] for column in key]
+        stale_ids = [
+            existing.id
+            for existing in db.execute(
+                select(table.c.id, *columns).where(tuple_(*columns).in_(list(wanted)))
+            )
+            if wanted[tuple(existing[1:])] != existing.id
+        ]
+        if stale_ids:
+            if table.name == models.Student.__tablename__:
+                db.execute(delete(models.StudentScore.__table__).where(
+                    models.StudentScore.__table__.c.student_id.in_(stale_ids)
+                ))
+            db.execute(delete(table).where(table.c.id.in_(stale_ids)))
+
+
+def _id_conflicts(db: Session, lines: Iterator[str], tables: Dict[str, Table], restorable: set) -> List[str]:
+    """预读备份，找出 id 已被其他记录占用的表
+
+    有唯一键的表中，现有行与备份行 id 相同但唯一键（如学号+考试、账号）不同，说明是
+    无关的两条记录，按 id 合并会覆盖现有数据。没有唯一键的表无法区分，按 id 合并。
+    """
+    conflicts: List[str] = []
+    pending: Dict[str, List[Dict[str, Any]]] = {}
+
+    def check(name: str) -> None:
+        rows = pending.pop(name, [])
+        if not rows or name in conflicts:
+            return
+        table = tables[name]
+        key_columns = sorted({column for key in _unique_keys(table) for column in key})
+        backup_rows = {row["id"]: row for row in rows}
+        for existing in db.execute(
+            select(table.c.id, *[table.c[column] for column in key_columns])
+            .where(table.c.id.in_(list(backup_rows)))
+        ).mappings():
+            row = backup_rows[existing["id"]]
+            if any(row.get(column) != existing[column] for column in key_columns):
+                conflicts.append(name)
+                return
+
+    for line in lines:
+        record = json.loads(line)
+        name = record.get("table")
+        row = record.get("row")
+        if row is None or name not in restorable or not _unique_keys(tables[name]):
+            continue
+        batch = pending.setdefault(name, [])
+        batch.append(row)
+        if len(batch) >= _RESTORE_CHUNK:
+            check(name)
+    for name in list(pending):
+        check(name)
+    return conflicts
+
+
+def _clear_tables(db: Session, names: Sequence[str]) -> None:
+    """按依赖倒序清空要恢复的表；清空 students 时一并清空其派生的单科成绩"""
+    for table in reversed(Base.metadata.sorted_tables):
+        if table.name in names:
+            if table.name == models.Student.__tablename__:
+                db.execute(delete(models.StudentScore.__table__))
+            db.execute(delete(table))
+    db.commit()
+
+
+def _restore_chunk(db: Session, table: Table, rows: List[Dict[str, Any]]) -> None:
+    _delete_conflicting(db, table, rows)
+    stmt = sqlite_insert(table)
+    columns = [name for name in rows[0] if name != "id"]
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={name: stmt.excluded[name] for name in columns},
+        ),
+        rows,
+    )
+    if table.name == models.Student.__tablename__:
+        replace_score_items(db, {row["id"]: row.get("scores") or [] for row in rows})
+
+
+def iter_restore(fileobj: BinaryIO, replace: bool = False) -> Iterator[Dict[str, Any]]:
+    """从 NDJSON 备份（可 gzip 压缩）增量恢复，逐块产出进度
+
+    各表按主键 id 合并（ON CONFLICT DO UPDATE），保留原始 id 以维持表间引用，适用于恢复到
+    空库或备份来源库；唯一键（如学号+考试、账号、手机号）与现有记录冲突时以备份为准。
+    恢复前预读一遍备份，若 id 已被唯一键不同的无关记录占用则拒绝恢复（RestoreError）；
+    replace 为真时不做检查，先清空备份中包含的表再恢复。fileobj 须可 seek。
+
+    每 _RESTORE_CHUNK 行提交一次，全部完成后按恢复后的总分区间配置重建 exam_stats。
+    格式错误时抛出 RestoreError。
+    """
+    tables = {table.name: table for table in Base.metadata.sorted_tables}
+    restorable = set(backup_tables())
+    lines = _open_lines(fileobj)
+
+    try:
+        manifest = json.loads(next(lines)).get("manifest")
+    except (StopIteration, ValueError, AttributeError):
+        manifest = None
+    if not manifest or manifest.get("format") != FORMAT_NAME:
+        raise RestoreError("不是有效的备份文件")
+    if manifest.get("version", 0) > FORMAT_VERSION:
+        raise RestoreError("备份文件版本过新，请升级系统后再恢复")
+
+    with SessionLocal() as db:
+        if replace:
+            _clear_tables(db, [name for name in manifest.get("tables", []) if name in restorable])
+        else:
+            try:
+                conflicts = _id_conflicts(db, lines, tables, restorable)
+            except (EOFError, OSError, zlib.error, ValueError):
+                raise RestoreError("备份文件已损坏，无法读取")
+            if conflicts:
+                raise RestoreError(
+                    f"备份中 {', '.join(conflicts)} 的记录 id 与现有的其他记录冲突，"
+                    "请恢复到空数据库，或选择清空现有数据后恢复"
+                )
+            lines = _open_lines(fileobj)
+            next(lines)
+
+    restored: Dict[str, int] = {}
+    table: Optional[Table] = None
+    total = 0
+    columns: List[str] = []
+    converters: Dict[str, Callable[[Any], Any]] = {}
+    chunk: List[Dict[str, Any]] = []
+    finished = False
+
+    with SessionLocal() as db:
+        def write_chunk() -> Dict[str, Any]:
+            _restore_chunk(db, table, chunk)
+            db.commit()
+            if table.name == models.SubjectRange.__tablename__:
+                range_config.invalidate()
+            restored[table.name] = restored.get(table.name, 0) + len(chunk)
+            chunk.clear()
+            return {"table": table.name, "restored": restored[table.name], "total": total}
+
+        for line in lines:
+            record = json.loads(line)
+            if record.get("end"):
+                finished = True
+                break
+            if "columns" in record:
+                if chunk:
+                    yield write_chunk()
+                name = record["table"]
+                # 未知表或派生表直接跳过
+                table = tables.get(name) if name in restorable else None
+                if table is not None:
+                    total = record.get("count", 0)
+                    columns = [column for column in record["columns"] if column in table.c]
+                    converters = _converters(table)
+                    restored.setdefault(name, 0)
+                continue
+            if table is None or record.get("table") != table.name:
+                continue
+            row = record["row"]
+            values = {}
+            for column in columns:
+                value = row.get(column)
+                if value is not None and column in converters:
+                    value = converters[column](value)
+                values[column] = value
+            chunk.append(values)
+            if len(chunk) >= _RESTORE_CHUNK:
+                yield write_chunk()
+
+        if table is not None and chunk:
+            yield write_chunk()
+        if not finished:
+            raise RestoreError("备份文件不完整（缺少结束标记），已恢复的数据已保留")
+
+        if models.Student.__tablename__ in restored:
+            # subject_ranges 可能刚从备份恢复，分数线须在全部分块提交后读取
+            rebuild_exam_stats(db, range_config.thresholds(db, TOTAL_SUBJECT, []))
+            sync_exams(db)
+            sync_classes(db)
+            db.commit()
+
+    yield {"done": True, "restored": restored}
@@ -0,0 +1,153 @@
+"""
+学生成绩批量写入（分块 INSERT ... ON CONFLICT DO UPDATE）
+
+按 (学号, 考试名称) 唯一约束 uq_student_exam 合并记录：已存在则覆盖姓名/班级/年级/成绩等列，
+不存在则新增；student_scores 单科成绩行与 students 同步重写。
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import insert, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from . import models
+from .scoring import explode_scores, summarize_scores
+
+StudentKey = Tuple[str, Optional[str]]
+StatsKey = Tuple[Optional[str], Optional[str], Optional[str]]
+
+# 每条 INSERT 语句携带的学生行数（SQLite 单语句绑定参数上限为 32766）
+_CHUNK_SIZE = 500
+
+# 冲突时需要覆盖的列；gender/排名等导入文件中没有的列保持原值
+_UPSERT_COLUMNS = (
+    "name",
+    "class_name",
+    "grade_name",
+    "exam_date",
+    "notes",
+    "scores",
+    "total_score",
+    "average_score",
+    "score_count",
+    "updated_at",
+)
+
+
+def _existing_keys(db: Session, exam_names: Iterable[Optional[str]]) -> Dict[StudentKey, Tuple[int, StatsKey]]:
+    """按考试预取已有记录：(学号, 考试) -> (id, 原 exam_stats 键)，每场考试一次查询"""
+    existing: Dict[StudentKey, Tuple[int, StatsKey]] = {}
+    for exam_name in exam_names:
+        exam_filter = (
+            models.Student.exam_name.is_(None) if exam_name is None else models.Student.exam_name == exam_name
+        )
+        rows = db.query(
+            models.Student.id,
+            models.Student.student_no,
+            models.Student.grade_name,
+            models.Student.class_name,
+        ).filter(exam_filter)
+        for row in rows:
+            existing[(row.student_no, exam_name)] = (row.id, (exam_name, row.grade_name, row.class_name))
+    return existing
+
+
+def _upsert_statement():
+    # 直接针对 Table 构造 Core 语句，绕过 ORM 批量写入逐行收集参数的开销
+    table = models.Student.__table__
+    stmt = sqlite_insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.student_no, table.c.exam_name],
+        set_={column: stmt.excluded[column] for column in _UPSERT_COLUMNS},
+    ).returning(table.c.id, table.c.student_no, table.c.exam_name)
+
+
+def _student_row(record: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    scores = record.get("scores") or []
+    total, average, count = summarize_scores(scores)
+    return {
+        "name": record["name"],
+        "student_no": record["student_no"],
+        "class_name": record.get("class_name"),
+        "grade_name": record.get("grade_name"),
+        "exam_name": record.get("exam_name"),
+        "exam_date": record.get("exam_date"),
+        "notes": record.get("notes"),
+        "scores": scores,
+        "total_score": total,
+        "average_score": average,
+        "score_count": count,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def replace_score_items(db: Session, scores_by_id: Dict[int, List[Dict[str, Any]]]) -> None:
+    """按学生 id 重写 student_scores 单科成绩行"""
+    if not scores_by_id:
+        return
+    db.query(models.StudentScore).filter(
+        models.StudentScore.student_id.in_(list(scores_by_id))
+    ).delete(synchronize_session=False)
+    items = [
+        {"student_id": student_id, "subject": subject, "score": score}
+        for student_id, scores in scores_by_id.items()
+        for subject, score in explode_scores(scores)
+    ]
+    if items:
+        db.execute(insert(models.StudentScore.__table__), items)
+
+
+def upsert_students(db: Session, records: Iterable[Dict[str, Any]]) -> Tuple[int, int, Set[StatsKey]]:
+    """批量合并学生成绩记录，返回 (新增数, 更新数, 受影响的 exam_stats 键)
+
+    records 中同一 (学号, 考试) 出现多次时以最后一条为准。写入与调用方处于同一事务，由调用方提交。
+    """
+    merged: Dict[StudentKey, Dict[str, Any]] = {}
+    for record in records:
+        merged[(record["student_no"], record.get("exam_name"))] = record
+    if not merged:
+        return 0, 0, set()
+
+    existing = _existing_keys(db, {exam_name for _, exam_name in merged})
+    now = datetime.utcnow()
+    stats_keys: Set[StatsKey] = set()
+    imported = 0
+    updated = 0
+
+    items = list(merged.items())
+    for start in range(0, len(items), _CHUNK_SIZE):
+        chunk = items[start:start + _CHUNK_SIZE]
+        rows = []
+        scores_by_id: Dict[int, List[Dict[str, Any]]] = {}
+        for key, record in chunk:
+            row = _student_row(record, now)
+            stats_keys.add((row["exam_name"], row["grade_name"], row["class_name"]))
+            found = existing.get(key)
+            if found:
+                stats_keys.add(found[1])
+                updated += 1
+            else:
+                imported += 1
+            if found and row["exam_name"] is None:
+                # 考试名称为空时唯一约束不生效（NULL 互不相等），按预取到的 id 直接更新
+                db.execute(
+                    update(models.Student)
+                    .where(models.Student.id == found[0])
+                    .values({column: row[column] for column in _UPSERT_COLUMNS})
+                )
+                scores_by_id[found[0]] = row["scores"]
+                continue
+            rows.append(row)
+
+        if rows:
+            # executemany + RETURNING 由 SQLAlchemy 合并为多行 VALUES 批量发送，语句只编译一次
+            for student_id, student_no, exam_name in db.execute(_upsert_statement(), rows):
+                scores_by_id[student_id] = merged[(student_no, exam_name)].get("scores") or []
+
+        replace_score_items(db, scores_by_id)
+
+    return imported, updated, stats_keys
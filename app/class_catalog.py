@@ -0,0 +1,67 @@
+"""
+班级维度表维护
+
+成绩系统与积分系统共用 points_classes 作为班级维度表：students.class_id 与
+points_students / points_groups 的 class_id 都指向它。students.class_name 仍保留为冗余列
+供统计与筛选使用。成绩写入后对涉及的班级调用 sync_classes()，登记新班级并回填
+students.class_id；班级行可能关联积分数据，不随成绩记录删除。
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+def class_id_of(db: Session, class_name: str) -> Optional[int]:
+    return db.query(models.PointsClass.id).filter(models.PointsClass.class_name == class_name).scalar()
+
+
+def class_filter(class_name: str) -> Any:
+    """按班级名称筛选 students 的条件：先在班级表查出 id，再按 class_id 索引过滤"""
+    class_id = select(models.PointsClass.id).where(models.PointsClass.class_name == class_name).scalar_subquery()
+    return models.Student.class_id == class_id
+
+
+def sync_classes(db: Session, class_names: Optional[Iterable[Optional[str]]] = None) -> None:
+    """登记成绩记录中出现的新班级并回填 students.class_id；class_names 为 None 时处理全部班级"""
+    student = models.Student
+    points_class = models.PointsClass
+    scope_names = None if class_names is None else sorted({name for name in class_names if name})
+    if scope_names is not None and not scope_names:
+        return
+
+    query = db.query(student.class_name, func.min(student.grade_name)).filter(
+        student.class_name.isnot(None), student.class_name != ""
+    )
+    if scope_names is not None:
+        query = query.filter(student.class_name.in_(scope_names))
+    present: Dict[str, Optional[str]] = dict(query.group_by(student.class_name))
+
+    names = list(present) if scope_names is None else scope_names
+    class_ids: Dict[str, int] = dict(
+        db.query(points_class.class_name, points_class.id).filter(points_class.class_name.in_(names))
+    )
+    missing = [name for name in present if name not in class_ids]
+    if missing:
+        db.execute(
+            insert(points_class),
+            [{"class_name": name, "grade_name": present[name], "is_active": True} for name in missing],
+        )
+        class_ids.update(
+            db.query(points_class.class_name, points_class.id).filter(points_class.class_name.in_(missing))
+        )
+
+    matched_id = select(points_class.id).where(points_class.class_name == student.class_name).scalar_subquery()
+    scope = [] if scope_names is None else [or_(
+        student.class_name.in_(names), student.class_id.in_(list(class_ids.values()))
+    )]
+    db.execute(
+        update(student)
+        .where(student.class_id.is_distinct_from(matched_id), *scope)
+        .values(class_id=matched_id, updated_at=student.updated_at)
+        .execution_options(synchronize_session=False)
+    )
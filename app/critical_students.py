@@ -0,0 +1,94 @@
+"""
+临界学生识别
+
+分数线取自区间配置（总分配置对应平均分，单科配置对应该科成绩）。每条分数线的临界带
+[分数线 - 阈值, 分数线) 作为一次范围查询下推到 SQL：总分走 students.average_score 索引，
+单科走 student_scores (subject, score) 索引，不扫描全部记录。
+"""
+from __future__ import annotations
+
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+
+TOTAL_SUBJECT = "总分"
+
+# (结果字段, 分数线序号, 分类名称)，分数线按 (及格, 良好, 优秀) 排列
+_BANDS = [
+    ("near_pass", 0, "接近及格"),
+    ("near_good", 1, "接近良好"),
+    ("near_excellent", 2, "接近优秀"),
+]
+
+
+def _band_query(db: Session, subject: str, filters: Sequence[Any]):
+    """返回 (查询, 分数列)；总分按平均分判断，单科按该科成绩判断"""
+    student = models.Student
+    columns = [student.student_no, student.name, student.class_name, student.exam_name, student.average_score]
+    if subject == TOTAL_SUBJECT:
+        score = student.average_score
+        query = db.query(*columns, score.label("score")).filter(student.score_count > 0, *filters)
+    else:
+        score = models.StudentScore.score
+        query = (
+            db.query(*columns, score.label("score"))
+            .join(student, student.id == models.StudentScore.student_id)
+            .filter(models.StudentScore.subject == subject, *filters)
+        )
+    return query, score
+
+
+def build_critical_students(
+    db: Session,
+    lines: Tuple[float, float, float],
+    threshold: float,
+    subject: str = TOTAL_SUBJECT,
+    class_names: Optional[List[str]] = None,
+    grade_name: Optional[str] = None,
+    exam_name: Optional[str] = None,
+) -> schemas.CriticalStudents:
+    """按 (及格线, 良好线, 优秀线) 找出低于分数线不超过 threshold 分的学生
+
+    每名学生只归入其上方最近的一条分数线：良好/优秀的临界带下限不低于前一条分数线。
+    各分类按距离分数线由近到远排序。
+    """
+    student = models.Student
+    filters = []
+    if class_names:
+        filters.append(student.class_name.in_(class_names))
+    if grade_name:
+        filters.append(student.grade_name == grade_name)
+    if exam_name:
+        filters.append(student.exam_name == exam_name)
+
+    result = {}
+    for field, idx, category in _BANDS:
+        line = lines[idx]
+        lower = line - threshold
+        if idx > 0:
+            lower = max(lower, lines[idx - 1])
+        query, score = _band_query(db, subject, filters)
+        rows = query.filter(score >= lower, score < line).order_by(score.desc(), student.student_no)
+        result[field] = [
+            schemas.CriticalStudent(
+                student_no=row.student_no,
+                name=row.name,
+                class_name=row.class_name,
+                exam_name=row.exam_name,
+                subject=subject,
+                score=round(row.score, 2),
+                average_score=round(row.average_score, 2),
+                distance_to_line=round(line - row.score, 2),
+                category=category,
+            )
+            for row in rows
+        ]
+
+    pass_min, good_min, excellent_min = lines
+    return schemas.CriticalStudents(
+        subject=subject,
+        lines={"pass": pass_min, "good": good_min, "excellent": excellent_min},
+        **result,
+    )
@@ -0,0 +1,83 @@
+"""
+成绩分析看板合并数据
+
+看板页面首屏需要的摘要、班级统计、班级对比、进步排行与临界学生由一次请求返回，
+各部分共用同一组筛选条件，在同一个读事务中读取，彼此一致。结果的 ETag 由 students 数据
+版本、区间配置版本与筛选参数派生，数据未变化时刷新页面只需一次 304 响应。
+"""
+from __future__ import annotations
+
+import hashlib
+import uuid
+from typing import Any, Hashable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import (
+    class_catalog, critical_students, exam_catalog, grade_stats, models, progress_analysis, query_cache,
+    range_config, schemas,
+)
+from .database import begin_read_snapshot
+
+Thresholds = Tuple[float, float, float]
+
+# 数据版本号只在进程内有效，ETag 中加入进程标识，重启或多进程部署时不会误判为未变化
+_INSTANCE = uuid.uuid4().hex
+
+
+def data_version() -> Tuple[int, int]:
+    """看板数据依赖的版本：(students 数据版本, 区间配置版本)，需在读取数据之前取得"""
+    return query_cache.students_version(), range_config.version()
+
+
+def etag(version: Tuple[int, int], params: Hashable) -> str:
+    digest = hashlib.sha256(repr((_INSTANCE, version, params)).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def build_dashboard(
+    db: Session,
+    thresholds: Thresholds,
+    exam_name: Optional[str] = None,
+    grade_name: Optional[str] = None,
+    class_name: Optional[str] = None,
+    limit: int = 10,
+    threshold: float = 5.0,
+) -> schemas.Dashboard:
+    """按筛选条件生成看板数据，各部分均按同一组考试/年级/班级筛选
+
+    进步排行指定考试时比较每名学生首次考试与该场考试，否则比较首次与最近一次考试。
+    """
+    begin_read_snapshot(db)
+    student = models.Student
+    filters: List[Any] = []
+    if exam_name:
+        filters.append(exam_catalog.exam_filter(exam_name))
+    if grade_name:
+        filters.append(student.grade_name == grade_name)
+    if class_name:
+        filters.append(class_catalog.class_filter(class_name))
+
+    return schemas.Dashboard(
+        exam_name=exam_name,
+        grade_name=grade_name,
+        class_name=class_name,
+        summary=grade_stats.build_summary(db, filters, thresholds),
+        class_stats=grade_stats.build_class_stats(
+            db, exam_name=exam_name, grade_name=grade_name, class_name=class_name
+        ),
+        class_comparison=grade_stats.build_class_comparison(
+            db, grade_name=grade_name, exam_name=exam_name, class_name=class_name
+        ),
+        progress=progress_analysis.build_progress_analysis(
+            db, limit, class_name, to_exam=exam_name, grade_name=grade_name
+        ),
+        critical_students=critical_students.build_critical_students(
+            db,
+            thresholds,
+            threshold,
+            class_names=[class_name] if class_name else None,
+            grade_name=grade_name,
+            exam_name=exam_name,
+        ),
+    )
@@ -6,7 +6,7 @@ import shutil
 from pathlib import Path
 
 from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
 # 获取数据存储目录
 def get_legacy_data_dir() -> Path:
@@ -71,6 +71,17 @@ SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, futu
 Base = declarative_base()
 
 
+def begin_read_snapshot(db: Session) -> None:
+    """在会话的连接上显式开启读事务，之后的多条查询读到同一时刻的数据
+
+    pysqlite 只在写语句前自动发送 BEGIN，单纯的 SELECT 各自读取最新提交的数据。
+    读事务持有共享锁，期间其他连接的写入需等待，调用方应尽快结束会话。
+    """
+    connection = db.connection()
+    if connection.dialect.name == "sqlite" and not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN")
+
+
 def get_db():
     """FastAPI dependency that yields a database session."""
     db = SessionLocal()
@@ -84,7 +95,10 @@ def init_db():
     """Create all database tables."""
     from . import models  # noqa: F401  # Import ensures models are registered with metadata
 
+    from .student_search import ensure_search_index
+
     Base.metadata.create_all(bind=engine)
+    ensure_search_index(engine)
     seed_subject_ranges()
 
 
@@ -0,0 +1,334 @@
+"""
+考试成绩矩阵分析（NumPy 向量化）
+
+将一场考试（可选限定年级/班级）加载为 学生 × 科目 的稠密矩阵，缺考记为 NaN，
+各项统计均在矩阵上一次性完成，避免逐行 Python 循环。
+"""
+from __future__ import annotations
+
+import warnings
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+
+
+@dataclass
+class ScoreMatrix:
+    """一场考试的成绩矩阵，values[i, j] 为第 i 名学生第 j 科成绩（缺考为 NaN）"""
+    subjects: List[str]
+    student_ids: np.ndarray
+    student_nos: List[str]
+    names: List[str]
+    class_names: List[Optional[str]]
+    values: np.ndarray
+
+    @property
+    def student_count(self) -> int:
+        return len(self.student_nos)
+
+
+def load_score_matrix(
+    db: Session,
+    subjects: Sequence[str],
+    exam_name: str,
+    grade_name: Optional[str] = None,
+    class_name: Optional[str] = None,
+) -> ScoreMatrix:
+    """按 subjects 的列顺序加载成绩矩阵，只读取学生基本列与 student_scores 行"""
+    filters = [models.Student.exam_name == exam_name]
+    if grade_name:
+        filters.append(models.Student.grade_name == grade_name)
+    if class_name:
+        filters.append(models.Student.class_name == class_name)
+
+    rows = (
+        db.query(
+            models.Student.id,
+            models.Student.student_no,
+            models.Student.name,
+            models.Student.class_name,
+        )
+        .filter(*filters)
+        .order_by(models.Student.id)
+        .all()
+    )
+    student_ids = np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows))
+    values = np.full((len(rows), len(subjects)), np.nan, dtype=np.float64)
+
+    if rows:
+        score_rows = (
+            db.query(models.StudentScore.student_id, models.StudentScore.subject, models.StudentScore.score)
+            .join(models.Student, models.Student.id == models.StudentScore.student_id)
+            .filter(*filters, models.StudentScore.subject.in_(list(subjects)))
+            .all()
+        )
+        if score_rows:
+            column_of = {subject: idx for idx, subject in enumerate(subjects)}
+            ids = np.fromiter((r[0] for r in score_rows), dtype=np.int64, count=len(score_rows))
+            cols = np.fromiter((column_of[r[1]] for r in score_rows), dtype=np.int64, count=len(score_rows))
+            scores = np.fromiter((r[2] for r in score_rows), dtype=np.float64, count=len(score_rows))
+            # student_ids 已按 id 升序，可直接二分定位行号
+            values[np.searchsorted(student_ids, ids), cols] = scores
+
+    return ScoreMatrix(
+        subjects=list(subjects),
+        student_ids=student_ids,
+        student_nos=[row.student_no for row in rows],
+        names=[row.name for row in rows],
+        class_names=[row.class_name for row in rows],
+        values=values,
+    )
+
+
+def _column_stats(values: np.ndarray) -> Dict[str, np.ndarray]:
+    """按列计算 count/mean/std/min/max/四分位数，全 NaN 的列结果为 NaN"""
+    count = np.count_nonzero(~np.isnan(values), axis=0)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        quantiles = (
+            np.nanquantile(values, [0.25, 0.5, 0.75], axis=0)
+            if values.shape[0]
+            else np.full((3, values.shape[1]), np.nan)
+        )
+        return {
+            "count": count,
+            "mean": np.nanmean(values, axis=0),
+            "std": np.nanstd(values, axis=0),
+            "min": np.nanmin(values, axis=0) if values.shape[0] else np.full(values.shape[1], np.nan),
+            "max": np.nanmax(values, axis=0) if values.shape[0] else np.full(values.shape[1], np.nan),
+            "q1": quantiles[0],
+            "median": quantiles[1],
+            "q3": quantiles[2],
+        }
+
+
+def bucket_counts(values: np.ndarray, range_config: Sequence[Dict[str, Any]]) -> List[int]:
+    """统计各区间人数
+
+    与前端一致：区间上下界均为闭区间，边界值归入分数线更高的区间；NaN 不计入。
+    """
+    assigned = np.full(values.shape, -1, dtype=np.int64)
+    present = ~np.isnan(values)
+    order = sorted(range(len(range_config)), key=lambda idx: range_config[idx].get("min", 0), reverse=True)
+    for idx in order:
+        segment = range_config[idx]
+        mask = present & (assigned < 0) & (values >= segment.get("min", 0))
+        if segment.get("max") is not None:
+            mask &= values <= segment["max"]
+        assigned[mask] = idx
+    counts = np.bincount(assigned[assigned >= 0], minlength=len(range_config))
+    return [int(count) for count in counts]
+
+
+def _round(value: Any) -> Optional[float]:
+    return None if value is None or np.isnan(value) else round(float(value), 2)
+
+
+def _subject_analytics(
+    subject: str,
+    stats: Dict[str, np.ndarray],
+    idx: int,
+    column: np.ndarray,
+    range_config: Optional[Sequence[Dict[str, Any]]],
+) -> schemas.SubjectAnalytics:
+    distribution = []
+    if range_config:
+        for segment, count in zip(range_config, bucket_counts(column, range_config)):
+            distribution.append(schemas.RangeBucket(**segment, count=count))
+    return schemas.SubjectAnalytics(
+        subject=subject,
+        count=int(stats["count"][idx]),
+        mean=_round(stats["mean"][idx]),
+        std=_round(stats["std"][idx]),
+        min=_round(stats["min"][idx]),
+        max=_round(stats["max"][idx]),
+        q1=_round(stats["q1"][idx]),
+        median=_round(stats["median"][idx]),
+        q3=_round(stats["q3"][idx]),
+        distribution=distribution,
+    )
+
+
+def analyze(
+    matrix: ScoreMatrix,
+    range_configs: Dict[str, Sequence[Dict[str, Any]]],
+    exam_name: str,
+    grade_name: Optional[str] = None,
+    include_students: bool = False,
+) -> schemas.ExamAnalytics:
+    """在成绩矩阵上一次性计算各科及总分/均分统计"""
+    values = matrix.values
+    subject_stats = _column_stats(values)
+
+    scored = np.count_nonzero(~np.isnan(values), axis=1)
+    has_scores = scored > 0
+    totals = np.where(has_scores, np.nansum(values, axis=1), np.nan)
+    averages = np.divide(totals, scored, out=np.full(totals.shape, np.nan), where=has_scores)
+    summary = np.column_stack([totals, averages]) if values.shape[0] else np.empty((0, 2))
+    summary_stats = _column_stats(summary)
+
+    subjects = [
+        _subject_analytics(subject, subject_stats, idx, values[:, idx], range_configs.get(subject))
+        for idx, subject in enumerate(matrix.subjects)
+    ]
+
+    students = []
+    if include_students:
+        for i in range(matrix.student_count):
+            students.append(schemas.StudentAnalytics(
+                student_no=matrix.student_nos[i],
+                name=matrix.names[i],
+                class_name=matrix.class_names[i],
+                subject_count=int(scored[i]),
+                total_score=_round(totals[i]),
+                average_score=_round(averages[i]),
+            ))
+
+    return schemas.ExamAnalytics(
+        exam_name=exam_name,
+        grade_name=grade_name,
+        student_count=matrix.student_count,
+        subjects=subjects,
+        # 总分区间与其余统计口径一致：按学生均分划分
+        total=_subject_analytics("总分", summary_stats, 0, totals, None),
+        average=_subject_analytics("总分", summary_stats, 1, averages, range_configs.get("总分")),
+        students=students,
+    )
+
+
+# ==================== 标准分 ====================
+
+TOTAL_SUBJECT = "总分"
+
+
+@dataclass
+class StandardScores:
+    """一个 (考试, 年级) 分区内各科及总分的 Z 分、T 分与百分位排名
+
+    各数组的列与 subjects 对应（末列为总分），行与 student_ids 对应；缺考为 NaN。
+    """
+    subjects: List[str]
+    student_ids: np.ndarray
+    student_nos: List[str]
+    names: List[str]
+    class_names: List[Optional[str]]
+    scores: np.ndarray
+    z: np.ndarray
+    t: np.ndarray
+    percentile: np.ndarray
+    count: np.ndarray
+    mean: np.ndarray
+    std: np.ndarray
+
+    def row_of(self, student_id: int) -> Optional[int]:
+        idx = int(np.searchsorted(self.student_ids, student_id))
+        if idx < len(self.student_ids) and self.student_ids[idx] == student_id:
+            return idx
+        return None
+
+    def export_cells(self, student_id: int) -> Optional[List[Any]]:
+        """导出用的 [T 分, 百分位] * 科目数，缺考科目留空；学生不在分区内时返回 None"""
+        row = self.row_of(student_id)
+        if row is None:
+            return None
+        cells: List[Any] = []
+        for col in range(len(self.subjects)):
+            if np.isnan(self.scores[row, col]):
+                cells += ["", ""]
+            else:
+                cells += [_round(self.t[row, col]), _round(self.percentile[row, col])]
+        return cells
+
+
+def _percentile_ranks(column: np.ndarray) -> np.ndarray:
+    """百分位排名：低于该分数的人数加同分人数的一半，占有效人数的百分比"""
+    ranks = np.full(column.shape, np.nan)
+    present = ~np.isnan(column)
+    values = column[present]
+    if values.size:
+        ordered = np.sort(values)
+        below = np.searchsorted(ordered, values, side="left")
+        not_above = np.searchsorted(ordered, values, side="right")
+        ranks[present] = (below + not_above) / 2 / values.size * 100
+    return ranks
+
+
+def standardize(matrix: ScoreMatrix) -> StandardScores:
+    """在成绩矩阵上按列计算标准分；总分为各科成绩之和（至少有一科成绩）"""
+    values = matrix.values
+    has_scores = np.count_nonzero(~np.isnan(values), axis=1) > 0
+    totals = np.where(has_scores, np.nansum(values, axis=1), np.nan)
+    scores = np.column_stack([values, totals])
+
+    count = np.count_nonzero(~np.isnan(scores), axis=0)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        mean = np.nanmean(scores, axis=0)
+        std = np.nanstd(scores, axis=0)
+        # 全员同分的科目标准差为 0，Z 分记为 0（缺考仍为 NaN）
+        z = (scores - mean) / np.where(std > 0, std, np.inf)
+    percentile = np.empty(scores.shape)
+    for idx in range(scores.shape[1]):
+        percentile[:, idx] = _percentile_ranks(scores[:, idx])
+
+    return StandardScores(
+        subjects=matrix.subjects + [TOTAL_SUBJECT],
+        student_ids=matrix.student_ids,
+        student_nos=matrix.student_nos,
+        names=matrix.names,
+        class_names=matrix.class_names,
+        scores=scores,
+        z=z,
+        t=50 + 10 * z,
+        percentile=percentile,
+        count=count,
+        mean=mean,
+        std=std,
+    )
+
+
+def standard_scores_response(
+    result: StandardScores,
+    exam_name: str,
+    grade_name: Optional[str] = None,
+    class_name: Optional[str] = None,
+) -> schemas.StandardScores:
+    """转换为接口返回结构；class_name 只筛选返回的学生，均值与标准差仍按整个分区计算"""
+    students = []
+    for i in range(len(result.student_nos)):
+        if class_name and result.class_names[i] != class_name:
+            continue
+        students.append(schemas.StudentStandardScores(
+            student_no=result.student_nos[i],
+            name=result.names[i],
+            class_name=result.class_names[i],
+            scores={
+                subject: schemas.StandardScore(
+                    score=_round(result.scores[i, j]),
+                    z=_round(result.z[i, j]),
+                    t=_round(result.t[i, j]),
+                    percentile=_round(result.percentile[i, j]),
+                )
+                for j, subject in enumerate(result.subjects)
+                if not np.isnan(result.scores[i, j])
+            },
+        ))
+    return schemas.StandardScores(
+        exam_name=exam_name,
+        grade_name=grade_name,
+        student_count=len(result.student_nos),
+        subjects=[
+            schemas.SubjectMoments(
+                subject=subject,
+                count=int(result.count[j]),
+                mean=_round(result.mean[j]),
+                std=_round(result.std[j]),
+            )
+            for j, subject in enumerate(result.subjects)
+        ],
+        students=students,
+    )
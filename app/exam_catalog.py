@@ -0,0 +1,125 @@
+"""
+考试维度表维护
+
+exams 表由 students.exam_name 派生：成绩写入后对涉及的考试调用 sync_exams()，登记新
+考试、回填 students.exam_id，并刷新考试日期、年级、科目列表；没有成绩记录且未发布的
+考试随之删除。考试列表和按考试筛选只查询这张小表，再按整数键 exam_id 走索引。
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import distinct, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from . import exam_snapshots, models
+
+
+def exam_filter(exam_name: str) -> Any:
+    """按考试名称筛选 students 的条件：先在 exams 表查出 id，再按 exam_id 索引过滤"""
+    exam_id = select(models.Exam.id).where(models.Exam.name == exam_name).scalar_subquery()
+    return models.Student.exam_id == exam_id
+
+
+def sync_exams(db: Session, exam_names: Optional[Iterable[Optional[str]]] = None) -> None:
+    """同步指定考试的维度记录与 students.exam_id；exam_names 为 None 时同步全部考试"""
+    student = models.Student
+    exam = models.Exam
+    if exam_names is None:
+        names = [
+            name
+            for (name,) in db.query(student.exam_name)
+            .filter(student.exam_name.isnot(None), student.exam_name != "")
+            .distinct()
+        ]
+    else:
+        names = sorted({name for name in exam_names if name})
+        if not names:
+            return
+
+    exam_ids: Dict[str, int] = dict(db.query(exam.name, exam.id).filter(exam.name.in_(names)))
+    missing = [name for name in names if name not in exam_ids]
+    if missing:
+        db.execute(insert(exam), [{"name": name, "subjects": []} for name in missing])
+        exam_ids.update(db.query(exam.name, exam.id).filter(exam.name.in_(missing)))
+
+    # 回填 exam_id：包括改名到其他考试或清空考试名称的记录
+    matched_id = select(exam.id).where(exam.name == student.exam_name).scalar_subquery()
+    stale = student.exam_id.is_distinct_from(matched_id)
+    scope = [] if exam_names is None else [or_(
+        student.exam_name.in_(names), student.exam_id.in_(list(exam_ids.values()))
+    )]
+    db.execute(
+        update(student)
+        .where(stale, *scope)
+        .values(exam_id=matched_id, updated_at=student.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+
+    _refresh_metadata(db, names, exam_ids)
+
+    if exam_names is None:
+        published = {snapshot.exam_name for snapshot in exam_snapshots.list_published()}
+        db.query(exam).update(
+            {exam.is_published: exam.name.in_(published)}, synchronize_session=False
+        )
+        db.query(exam).filter(exam.name.notin_(names), exam.is_published.is_(False)).delete(
+            synchronize_session=False
+        )
+
+
+def _refresh_metadata(db: Session, names: List[str], exam_ids: Dict[str, int]) -> None:
+    student = models.Student
+    score = models.StudentScore
+    summary = {
+        row.exam_name: row
+        for row in db.query(
+            student.exam_name,
+            func.min(student.exam_date).label("exam_date"),
+            func.count(distinct(student.grade_name)).label("grade_count"),
+            func.max(student.grade_name).label("grade_name"),
+        )
+        .filter(student.exam_name.in_(names))
+        .group_by(student.exam_name)
+    }
+    subjects: Dict[str, List[str]] = {}
+    for exam_name, subject in (
+        db.query(student.exam_name, score.subject)
+        .join(score, score.student_id == student.id)
+        .filter(student.exam_name.in_(names))
+        .group_by(student.exam_name, score.subject)
+        # 科目按首次录入的先后排列
+        .order_by(student.exam_name, func.min(score.id))
+    ):
+        subjects.setdefault(exam_name, []).append(subject)
+
+    values = []
+    empty = []
+    for name in names:
+        row = summary.get(name)
+        if row is None:
+            empty.append(exam_ids[name])
+            continue
+        values.append({
+            "id": exam_ids[name],
+            "exam_date": row.exam_date,
+            "grade_name": row.grade_name if row.grade_count == 1 else None,
+            "subjects": subjects.get(name, []),
+        })
+    if values:
+        db.execute(update(models.Exam), values)
+    if empty:
+        # 已发布的考试保留，取消发布时再清理
+        db.query(models.Exam).filter(
+            models.Exam.id.in_(empty), models.Exam.is_published.is_(False)
+        ).delete(synchronize_session=False)
+
+
+def set_published(db: Session, exam_name: str, published: bool) -> None:
+    """更新考试的发布标记；取消发布后没有成绩记录的考试随之删除"""
+    sync_exams(db, [exam_name])
+    db.query(models.Exam).filter(models.Exam.name == exam_name).update(
+        {models.Exam.is_published: published}, synchronize_session=False
+    )
+    if not published:
+        sync_exams(db, [exam_name])
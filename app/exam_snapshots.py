@@ -0,0 +1,157 @@
+"""
+已发布考试成绩快照
+
+发布考试时将该场考试全部学生的序列化成绩冻结为 gzip 压缩的 JSON 文件（数据目录下
+published_exams/），并预先建立按学号、按姓名的索引。家长端查询已发布考试时直接读取
+内存中的快照，不经过 ORM 也不访问 SQLite，与教师端写入互不争用。
+
+快照不会随成绩修改自动更新，修改后需重新发布。
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .database import get_data_dir
+
+
+@dataclass
+class ExamSnapshot:
+    exam_name: str
+    published_at: str
+    etag: str
+    records: List[Dict[str, Any]]
+    by_student_no: Dict[str, List[int]]
+    by_name: Dict[str, List[int]]
+
+    @property
+    def student_count(self) -> int:
+        return len(self.records)
+
+    def exact(self, keyword: str) -> List[Dict[str, Any]]:
+        """姓名或学号完全一致的记录，保持快照中的先后顺序（创建时间倒序）"""
+        indexes = sorted({*self.by_student_no.get(keyword, ()), *self.by_name.get(keyword, ())})
+        return [self.records[idx] for idx in indexes]
+
+    def search(self, keyword: str) -> Optional[Dict[str, Any]]:
+        """优先精确匹配，否则按姓名/学号子串（不区分大小写）取最新的一条"""
+        matched = self.exact(keyword)
+        if matched:
+            return matched[0]
+        lowered = keyword.lower()
+        for record in self.records:
+            if lowered in record["name"].lower() or lowered in record["student_no"].lower():
+                return record
+        return None
+
+
+_lock = threading.Lock()
+_snapshots: Optional[Dict[str, ExamSnapshot]] = None
+
+
+def _snapshot_dir() -> Path:
+    return get_data_dir() / "published_exams"
+
+
+def _snapshot_path(exam_name: str) -> Path:
+    # 考试名称可能含中文或路径字符，文件名使用其摘要
+    digest = hashlib.sha1(exam_name.encode("utf-8")).hexdigest()
+    return _snapshot_dir() / f"{digest}.json.gz"
+
+
+def _index(records: List[Dict[str, Any]], field: str) -> Dict[str, List[int]]:
+    index: Dict[str, List[int]] = {}
+    for idx, record in enumerate(records):
+        index.setdefault(record[field], []).append(idx)
+    return index
+
+
+def _load(blob: bytes) -> ExamSnapshot:
+    data = json.loads(gzip.decompress(blob))
+    return ExamSnapshot(
+        exam_name=data["exam_name"],
+        published_at=data["published_at"],
+        etag=f'"{hashlib.sha256(blob).hexdigest()[:32]}"',
+        records=data["records"],
+        by_student_no=data["by_student_no"],
+        by_name=data["by_name"],
+    )
+
+
+def _registry() -> Dict[str, ExamSnapshot]:
+    """首次访问时从磁盘加载全部快照，之后常驻内存"""
+    global _snapshots
+    if _snapshots is None:
+        with _lock:
+            if _snapshots is None:
+                loaded: Dict[str, ExamSnapshot] = {}
+                directory = _snapshot_dir()
+                if directory.exists():
+                    for path in directory.glob("*.json.gz"):
+                        snapshot = _load(path.read_bytes())
+                        loaded[snapshot.exam_name] = snapshot
+                _snapshots = loaded
+    return _snapshots
+
+
+def get(exam_name: Optional[str]) -> Optional[ExamSnapshot]:
+    if not exam_name:
+        return None
+    return _registry().get(exam_name)
+
+
+def list_published() -> List[ExamSnapshot]:
+    return sorted(_registry().values(), key=lambda snapshot: snapshot.exam_name)
+
+
+def publish(exam_name: str, records: List[Dict[str, Any]]) -> ExamSnapshot:
+    """写入考试快照并替换内存中的旧版本
+
+    records 为已序列化（JSON 兼容）的学生成绩，须按创建时间倒序排列。
+    """
+    payload = {
+        "exam_name": exam_name,
+        "published_at": datetime.utcnow().isoformat(),
+        "records": records,
+        "by_student_no": _index(records, "student_no"),
+        "by_name": _index(records, "name"),
+    }
+    blob = gzip.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"), mtime=0)
+    path = _snapshot_path(exam_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # 先写临时文件再原子替换，避免读到写了一半的快照
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(blob)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+    snapshot = _load(blob)
+    registry = _registry()
+    with _lock:
+        registry[exam_name] = snapshot
+    return snapshot
+
+
+def unpublish(exam_name: str) -> bool:
+    registry = _registry()
+    with _lock:
+        removed = registry.pop(exam_name, None)
+    _snapshot_path(exam_name).unlink(missing_ok=True)
+    return removed is not None
+
+
+def clear() -> None:
+    for snapshot in list_published():
+        unpublish(snapshot.exam_name)
@@ -0,0 +1,472 @@
+"""
+成绩统计聚合（在 SQL 中分组计算，避免把整张 students 表加载到 Python）
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, case, func, insert, or_, true
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+
+UNASSIGNED_CLASS = "未分配班级"
+UNNAMED_EXAM = "未命名考试"
+
+Thresholds = Tuple[float, float, float]
+StatsKey = Tuple[Optional[str], Optional[str], Optional[str]]
+
+# 每批按键刷新的 (考试, 年级, 班级) 数量，避免单条 SQL 过长
+_REFRESH_BATCH = 200
+
+
+def _rate(count: Optional[float], total: int) -> float:
+    return round((count or 0) / total * 100, 2) if total > 0 else 0.0
+
+
+def _rate_columns(thresholds: Thresholds) -> List[Any]:
+    """有成绩记录数、均分之和及及格/良好/优秀人数的聚合列"""
+    pass_min, good_min, excellent_min = thresholds
+    scored = models.Student.score_count > 0
+    average = models.Student.average_score
+    return [
+        func.sum(case((scored, 1), else_=0)).label("valid_count"),
+        func.sum(case((scored, average), else_=0.0)).label("average_sum"),
+        func.sum(case((and_(scored, average >= pass_min), 1), else_=0)).label("pass_count"),
+        func.sum(case((and_(scored, average >= good_min), 1), else_=0)).label("good_count"),
+        func.sum(case((and_(scored, average >= excellent_min), 1), else_=0)).label("excellent_count"),
+    ]
+
+
+def build_summary(db: Session, filters: Sequence[Any], thresholds: Thresholds) -> schemas.StudentSummary:
+    """学生统计摘要：人数、平均总分、最高分及各等级比例"""
+    pass_min, good_min, excellent_min = thresholds
+    average = models.Student.average_score
+    total_students, average_total, pass_count, good_count, excellent_count = (
+        db.query(
+            func.count(models.Student.id),
+            func.avg(models.Student.total_score),
+            func.sum(case((average >= pass_min, 1), else_=0)),
+            func.sum(case((average >= good_min, 1), else_=0)),
+            func.sum(case((average >= excellent_min, 1), else_=0)),
+        )
+        .filter(*filters)
+        .one()
+    )
+
+    if not total_students:
+        return schemas.StudentSummary(
+            total_students=0,
+            average_total=0.0,
+            highest_total=None,
+            highest_student=None,
+            pass_rate=0.0,
+            good_rate=0.0,
+            excellent_rate=0.0,
+        )
+
+    highest_name, highest_total = (
+        db.query(models.Student.name, models.Student.total_score)
+        .filter(*filters)
+        .order_by(models.Student.total_score.desc(), models.Student.id)
+        .first()
+    )
+    return schemas.StudentSummary(
+        total_students=total_students,
+        average_total=round(average_total or 0, 2),
+        highest_total=round(highest_total, 2) if highest_total is not None else None,
+        highest_student=highest_name,
+        pass_rate=_rate(pass_count, total_students),
+        good_rate=_rate(good_count, total_students),
+        excellent_rate=_rate(excellent_count, total_students),
+    )
+
+
+def _class_label(class_name: str) -> str:
+    return class_name or UNASSIGNED_CLASS
+
+
+def _min_grade(grades: Iterable[str]) -> Optional[str]:
+    present = [grade for grade in grades if grade]
+    return min(present) if present else None
+
+
+def _sum_rates(stats: Iterable[models.ExamStat]) -> Dict[str, Any]:
+    totals = {"student_count": 0, "average_sum": 0.0, "pass_count": 0, "good_count": 0, "excellent_count": 0}
+    for stat in stats:
+        for field in totals:
+            totals[field] += getattr(stat, field)
+    return totals
+
+
+def build_class_stats(
+    db: Session,
+    exam_name: Optional[str] = None,
+    grade_name: Optional[str] = None,
+    class_name: Optional[str] = None,
+) -> List[schemas.ClassStats]:
+    """按班级分组的人数、性别、考试场次及成绩等级统计，默认汇总全部考试"""
+    stats_query = db.query(models.ExamStat)
+    student_filters = []
+    for column, stats_column, value in (
+        (models.Student.exam_name, models.ExamStat.exam_name, exam_name),
+        (models.Student.grade_name, models.ExamStat.grade_name, grade_name),
+        (models.Student.class_name, models.ExamStat.class_name, class_name),
+    ):
+        if value:
+            stats_query = stats_query.filter(stats_column == value)
+            student_filters.append(column == value)
+
+    by_class: Dict[str, List[models.ExamStat]] = {}
+    for stat in stats_query.all():
+        by_class.setdefault(_class_label(stat.class_name), []).append(stat)
+    if not by_class:
+        return []
+
+    # 跨考试去重的学生人数/性别人数依赖学号，走 (class_name, student_no, gender) 覆盖索引
+    class_label = func.coalesce(func.nullif(models.Student.class_name, ""), UNASSIGNED_CLASS)
+    student_no = models.Student.student_no
+    distinct_counts = {
+        row.class_name: row
+        for row in db.query(
+            class_label.label("class_name"),
+            func.count(func.distinct(student_no)).label("total_students"),
+            func.count(func.distinct(case((models.Student.gender == "男", student_no)))).label("male_count"),
+            func.count(func.distinct(case((models.Student.gender == "女", student_no)))).label("female_count"),
+        ).filter(*student_filters).group_by(class_label)
+    }
+
+    result = []
+    for class_name, stats in by_class.items():
+        counts = distinct_counts.get(class_name)
+        total_students = counts.total_students if counts else 0
+        male_count = counts.male_count if counts else 0
+        female_count = counts.female_count if counts else 0
+        totals = _sum_rates(stats)
+        valid = totals["student_count"]
+        exam_count = len({stat.exam_name for stat in stats if stat.exam_name})
+        result.append(schemas.ClassStats(
+            class_name=class_name,
+            grade_name=_min_grade(stat.grade_name for stat in stats),
+            total_students=total_students,
+            exam_count=exam_count or 1,
+            male_count=male_count,
+            female_count=female_count,
+            male_ratio=_rate(male_count, total_students),
+            female_ratio=_rate(female_count, total_students),
+            average_score=round(totals["average_sum"] / valid, 2) if valid > 0 else 0.0,
+            pass_rate=_rate(totals["pass_count"], valid),
+            good_rate=_rate(totals["good_count"], valid),
+            excellent_rate=_rate(totals["excellent_count"], valid),
+        ))
+    return sorted(result, key=lambda x: (x.grade_name or "", x.class_name))
+
+
+def build_filter_options(db: Session) -> schemas.FilterOptions:
+    """有成绩记录的考试、年级、班级名称，取自按 (考试, 年级, 班级) 汇总的 exam_stats"""
+    exams, grades, classes = set(), set(), set()
+    for exam_name, grade_name, class_name in db.query(
+        models.ExamStat.exam_name, models.ExamStat.grade_name, models.ExamStat.class_name
+    ).filter(models.ExamStat.record_count > 0):
+        exams.add(exam_name)
+        grades.add(grade_name)
+        classes.add(class_name)
+    # 空字符串表示未填写，不作为筛选项
+    return schemas.FilterOptions(
+        exams=sorted(exams - {""}),
+        grades=sorted(grades - {""}),
+        classes=sorted(classes - {""}),
+    )
+
+
+def build_class_comparison(
+    db: Session,
+    grade_name: Optional[str] = None,
+    exam_name: Optional[str] = None,
+    class_name: Optional[str] = None,
+) -> List[schemas.ClassComparison]:
+    """按班级对比均分及各等级比例，按均分降序"""
+    query = db.query(models.ExamStat).filter(models.ExamStat.student_count > 0)
+    if grade_name:
+        query = query.filter(models.ExamStat.grade_name == grade_name)
+    if exam_name:
+        query = query.filter(models.ExamStat.exam_name == exam_name)
+    if class_name:
+        query = query.filter(models.ExamStat.class_name == class_name)
+
+    by_class: Dict[str, List[models.ExamStat]] = {}
+    for stat in query.all():
+        by_class.setdefault(_class_label(stat.class_name), []).append(stat)
+
+    result = []
+    for class_name, stats in by_class.items():
+        totals = _sum_rates(stats)
+        valid = totals["student_count"]
+        result.append(schemas.ClassComparison(
+            class_name=class_name,
+            grade_name=_min_grade(stat.grade_name for stat in stats),
+            student_count=valid,
+            average_score=round(totals["average_sum"] / valid, 2),
+            pass_rate=_rate(totals["pass_count"], valid),
+            good_rate=_rate(totals["good_count"], valid),
+            excellent_rate=_rate(totals["excellent_count"], valid),
+        ))
+
+    result.sort(key=lambda x: x.average_score, reverse=True)
+    return result
+
+
+def build_class_trend(db: Session, class_name: str) -> Optional[schemas.ClassTrend]:
+    """班级历次考试趋势；班级不存在时返回 None"""
+    stats = db.query(models.ExamStat).filter(models.ExamStat.class_name == class_name).all()
+    if not stats:
+        return None
+
+    by_exam: Dict[str, List[models.ExamStat]] = {}
+    for stat in stats:
+        by_exam.setdefault(stat.exam_name or UNNAMED_EXAM, []).append(stat)
+
+    trend_data = []
+    for exam_name, exam_stats in by_exam.items():
+        totals = _sum_rates(exam_stats)
+        valid = totals["student_count"]
+        if valid <= 0:
+            continue
+        created = [stat.first_created_at for stat in exam_stats if stat.first_created_at]
+        trend_data.append(schemas.ClassTrendPoint(
+            exam_name=exam_name,
+            exam_date=min(created) if created else None,
+            average_score=round(totals["average_sum"] / valid, 2),
+            pass_rate=_rate(totals["pass_count"], valid),
+            good_rate=_rate(totals["good_count"], valid),
+            excellent_rate=_rate(totals["excellent_count"], valid),
+            student_count=valid,
+        ))
+
+    trend_data.sort(key=lambda x: x.exam_date if x.exam_date else datetime.min)
+    return schemas.ClassTrend(
+        class_name=class_name,
+        grade_name=_min_grade(stat.grade_name for stat in stats),
+        trend_data=trend_data,
+    )
+
+
+def build_student_trends(
+    db: Session,
+    student_nos: Optional[Sequence[str]] = None,
+    class_name: Optional[str] = None,
+) -> List[schemas.StudentTrend]:
+    """一次查询取出多名学生的历次考试成绩，按学号分组、按考试日期排序
+
+    class_name 指定时包含该班级出现过的全部学生及其在其他班级的考试记录。
+    每名学生的记录按考试日期排序，未填写考试日期的记录以录入时间代替（与进步分析一致），
+    与图上显示的日期顺序相同。
+    """
+    student = models.Student
+    filters = []
+    if student_nos:
+        filters.append(student.student_no.in_(student_nos))
+    if class_name:
+        class_students = db.query(student.student_no).filter(student.class_name == class_name)
+        filters.append(student.student_no.in_(class_students.scalar_subquery()))
+
+    rows = (
+        db.query(
+            student.student_no,
+            student.name,
+            student.class_name,
+            student.exam_name,
+            student.exam_date,
+            student.created_at,
+            student.total_score,
+            student.average_score,
+            student.scores,
+        )
+        .filter(*filters)
+        .order_by(
+            student.student_no,
+            func.coalesce(student.exam_date, student.created_at),
+            student.created_at,
+            student.id,
+        )
+    )
+
+    trends: List[schemas.StudentTrend] = []
+    for row in rows:
+        if not trends or trends[-1].student_no != row.student_no:
+            # 姓名、班级取最早一次考试的记录
+            trends.append(schemas.StudentTrend(
+                student_no=row.student_no, name=row.name, class_name=row.class_name, exams=[]
+            ))
+        trends[-1].exams.append(schemas.ExamTrendPoint(
+            exam_name=row.exam_name or UNNAMED_EXAM,
+            exam_date=row.exam_date or row.created_at,
+            total_score=round(row.total_score, 2),
+            average_score=round(row.average_score, 2),
+            subject_scores={item.get("subject"): item.get("score", 0) for item in row.scores or []},
+        ))
+    return trends
+
+
+def _bucket_case(conditions: Iterable[Tuple[Any, Any, Sequence[Dict[str, Any]]]]):
+    """按区间配置生成区间序号的 CASE 表达式
+
+    与前端一致：区间上下界均为闭区间，边界值归入分数线更高的区间；不在任何区间内为 NULL。
+    conditions 为 (前置条件, 分数列, 区间配置)，各科目的分支拼接在同一个 CASE 中。
+    """
+    whens = []
+    for condition, column, config in conditions:
+        for idx in sorted(range(len(config)), key=lambda i: config[i].get("min", 0), reverse=True):
+            segment = config[idx]
+            bounds = [column >= segment.get("min", 0)]
+            if segment.get("max") is not None:
+                bounds.append(column <= segment["max"])
+            whens.append((and_(condition, *bounds), idx))
+    return case(*whens, else_=None)
+
+
+def build_distribution(
+    db: Session,
+    filters: Sequence[Any],
+    range_configs: Dict[str, Sequence[Dict[str, Any]]],
+    total_subject: str = "总分",
+) -> List[schemas.SubjectDistribution]:
+    """各科目及总分在区间配置各分段的人数
+
+    单科成绩在 student_scores 上按 (科目, 区间) 一次分组统计；总分与其余统计口径一致，
+    按有成绩记录的平均分划分。返回顺序同 range_configs。
+    """
+    subjects = [subject for subject in range_configs if subject != total_subject]
+    counts: Dict[str, Dict[Optional[int], int]] = {subject: {} for subject in range_configs}
+
+    if subjects:
+        score = models.StudentScore
+        bucket = _bucket_case(
+            (score.subject == subject, score.score, range_configs[subject]) for subject in subjects
+        ).label("bucket")
+        rows = (
+            db.query(score.subject, bucket, func.count().label("count"))
+            .join(models.Student, models.Student.id == score.student_id)
+            .filter(score.subject.in_(subjects), *filters)
+            .group_by(score.subject, bucket)
+        )
+        for subject, idx, count in rows:
+            counts[subject][idx] = count
+
+    if total_subject in range_configs:
+        average = models.Student.average_score
+        bucket = _bucket_case([(true(), average, range_configs[total_subject])]).label("bucket")
+        rows = (
+            db.query(bucket, func.count().label("count"))
+            .filter(models.Student.score_count > 0, *filters)
+            .group_by(bucket)
+        )
+        counts[total_subject] = {idx: count for idx, count in rows}
+
+    return [
+        schemas.SubjectDistribution(
+            subject=subject,
+            count=sum(counts[subject].values()),
+            buckets=[
+                schemas.RangeBucket(**segment, count=counts[subject].get(idx, 0))
+                for idx, segment in enumerate(config)
+            ],
+        )
+        for subject, config in range_configs.items()
+    ]
+
+
+# ==================== exam_stats 维护 ====================
+
+def exam_stats_key(student: models.Student) -> StatsKey:
+    """学生记录所属的 exam_stats 键 (考试, 年级, 班级)"""
+    return (student.exam_name, student.grade_name, student.class_name)
+
+
+def _normalize_key(key: StatsKey) -> Tuple[str, str, str]:
+    return tuple(value or "" for value in key)
+
+
+def _key_match(column, value: str):
+    if value == "":
+        return or_(column.is_(None), column == "")
+    return column == value
+
+
+def _insert_aggregates(db: Session, filters: Sequence[Any], thresholds: Thresholds) -> None:
+    exam_key = func.coalesce(models.Student.exam_name, "")
+    grade_key = func.coalesce(models.Student.grade_name, "")
+    class_key = func.coalesce(models.Student.class_name, "")
+    rows = (
+        db.query(
+            exam_key.label("exam_name"),
+            grade_key.label("grade_name"),
+            class_key.label("class_name"),
+            func.count(models.Student.id).label("record_count"),
+            func.min(models.Student.created_at).label("first_created_at"),
+            *_rate_columns(thresholds),
+        )
+        .filter(*filters)
+        .group_by(exam_key, grade_key, class_key)
+        .all()
+    )
+    if not rows:
+        return
+    db.execute(
+        insert(models.ExamStat),
+        [
+            {
+                "exam_name": row.exam_name,
+                "grade_name": row.grade_name,
+                "class_name": row.class_name,
+                "record_count": row.record_count,
+                "student_count": row.valid_count or 0,
+                "average_sum": row.average_sum or 0.0,
+                "pass_count": row.pass_count or 0,
+                "good_count": row.good_count or 0,
+                "excellent_count": row.excellent_count or 0,
+                "first_created_at": row.first_created_at,
+            }
+            for row in rows
+        ],
+    )
+
+
+def refresh_exam_stats(db: Session, keys: Iterable[StatsKey], thresholds: Thresholds) -> None:
+    """重新聚合受影响的 (考试, 年级, 班级) 统计行"""
+    normalized = sorted({_normalize_key(key) for key in keys})
+    for start in range(0, len(normalized), _REFRESH_BATCH):
+        batch = normalized[start:start + _REFRESH_BATCH]
+        db.query(models.ExamStat).filter(
+            or_(*[
+                and_(
+                    models.ExamStat.exam_name == exam_name,
+                    models.ExamStat.grade_name == grade_name,
+                    models.ExamStat.class_name == class_name,
+                )
+                for exam_name, grade_name, class_name in batch
+            ])
+        ).delete(synchronize_session=False)
+        _insert_aggregates(
+            db,
+            [or_(*[
+                and_(
+                    _key_match(models.Student.exam_name, exam_name),
+                    _key_match(models.Student.grade_name, grade_name),
+                    _key_match(models.Student.class_name, class_name),
+                )
+                for exam_name, grade_name, class_name in batch
+            ])],
+            thresholds,
+        )
+
+
+def rebuild_exam_stats(db: Session, thresholds: Thresholds) -> None:
+    """按当前分数线整表重建 exam_stats（分数线变更或数据恢复后调用）"""
+    db.query(models.ExamStat).delete(synchronize_session=False)
+    _insert_aggregates(db, [], thresholds)
+
+
+def clear_exam_stats(db: Session) -> None:
+    db.query(models.ExamStat).delete(synchronize_session=False)
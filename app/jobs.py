@@ -0,0 +1,224 @@
+"""
+后台任务执行器
+
+耗时操作（导入、导出、恢复、排名计算）以任务形式提交到有界线程池中执行，不占用处理
+HTTP 请求的线程。任务状态写入 jobs 表，服务重启后仍可查询；重启时未完成的任务标记为失败。
+
+任务函数签名为 func(ctx, db, *args) -> 结果字典：db 为任务专用会话，由执行器在成功后
+提交、失败或取消时回滚；ctx 用于汇报进度和检查取消请求。
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal, get_data_dir
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+# 同时执行的任务数；SQLite 同一时刻只允许一个写事务，默认只开少量线程
+_MAX_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# 已结束任务的记录及结果文件保留天数，服务启动时清理过期的部分
+_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+# 写入任务结束状态失败（如数据库被其他事务长时间锁定）时的重试次数与间隔（秒）
+_FINISH_ATTEMPTS = 3
+_FINISH_RETRY_DELAY = 1.0
+
+_executor = ThreadPoolExecutor(max_workers=_MAX_WORKERS, thread_name_prefix="grade-job")
+
+# 运行中任务的实时进度只保存在内存中：任务的写事务未提交前，其他连接无法写入 jobs 表
+_live_lock = threading.Lock()
+_live_progress: Dict[str, Tuple[float, Optional[str]]] = {}
+_cancel_requested: set = set()
+
+
+class JobCancelled(Exception):
+    """任务被用户取消"""
+
+
+class JobContext:
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+
+    def check_cancelled(self) -> None:
+        if self.job_id in _cancel_requested:
+            raise JobCancelled()
+
+    def progress(self, fraction: float, message: Optional[str] = None) -> None:
+        """汇报进度（0~1），同时作为取消检查点"""
+        with _live_lock:
+            _live_progress[self.job_id] = (max(0.0, min(fraction, 1.0)), message)
+        self.check_cancelled()
+
+    def result_path(self, suffix: str) -> Path:
+        """任务结果文件的保存路径"""
+        directory = get_data_dir() / "jobs"
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory / f"{self.job_id}{suffix}"
+
+
+def live_progress(job_id: str) -> Optional[Tuple[float, Optional[str]]]:
+    with _live_lock:
+        return _live_progress.get(job_id)
+
+
+def _update(job_id: str, **values: Any) -> None:
+    with SessionLocal() as db:
+        db.query(models.Job).filter(models.Job.id == job_id).update(values, synchronize_session=False)
+        db.commit()
+
+
+def _finish(job_id: str, status: str, **values: Any) -> None:
+    with _live_lock:
+        _live_progress.pop(job_id, None)
+        _cancel_requested.discard(job_id)
+    for attempt in range(1, _FINISH_ATTEMPTS + 1):
+        try:
+            _update(job_id, status=status, finished_at=datetime.utcnow(), **values)
+            return
+        except Exception:
+            if attempt == _FINISH_ATTEMPTS:
+                raise
+            logger.warning("任务 %s 状态写入失败，%s 秒后重试", job_id, _FINISH_RETRY_DELAY)
+            time.sleep(_FINISH_RETRY_DELAY)
+
+
+def _run(job_id: str, func: Callable[..., Dict[str, Any]], args: Tuple[Any, ...]) -> None:
+    ctx = JobContext(job_id)
+    if job_id in _cancel_requested:
+        _finish(job_id, CANCELLED, message="已取消")
+        return
+
+    db = SessionLocal()
+    try:
+        # 标记运行中也可能因数据库被锁而失败，此时按任务失败处理，避免任务一直停留在 pending
+        _update(job_id, status=RUNNING, started_at=datetime.utcnow())
+        result = func(ctx, db, *args)
+        db.commit()
+    except JobCancelled:
+        db.rollback()
+        db.close()
+        _finish(job_id, CANCELLED, message="已取消")
+        return
+    except Exception as exc:
+        db.rollback()
+        db.close()
+        # HTTPException 等业务错误优先使用其 detail 作为提示，不记录堆栈
+        detail = getattr(exc, "detail", None)
+        if detail:
+            logger.warning("任务 %s 执行失败: %s", job_id, detail)
+        else:
+            logger.exception("任务 %s 执行失败", job_id)
+        _finish(job_id, FAILED, error=str(detail or exc))
+        return
+    db.close()
+
+    result = result or {}
+    result_file = result.pop("_result_file", None)
+    _finish(job_id, SUCCEEDED, progress=1.0, message="已完成", result=result, result_file=result_file)
+
+
+def submit(
+    kind: str,
+    func: Callable[..., Dict[str, Any]],
+    *args: Any,
+    member_id: Optional[int] = None,
+) -> models.Job:
+    """登记任务并提交到线程池，返回已持久化的任务记录
+
+    任务函数返回的结果中若包含 "_result_file"（结果文件路径），该路径记录到任务上供下载。
+    """
+    with SessionLocal() as db:
+        job = models.Job(id=uuid.uuid4().hex, kind=kind, status=PENDING, progress=0.0, member_id=member_id)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        db.expunge(job)
+    _executor.submit(_run, job.id, func, args).add_done_callback(_log_escaped_error)
+    return job
+
+
+def _log_escaped_error(future: Future) -> None:
+    """线程池会吞掉 _run 抛出的异常（如结束状态写入失败），在此记录日志"""
+    exc = future.exception()
+    if exc is not None:
+        logger.error("后台任务执行器异常", exc_info=exc)
+
+
+def request_cancel(db: Session, job: models.Job) -> None:
+    """请求取消任务：排队中的任务不再执行，运行中的任务在下一个检查点停止"""
+    with _live_lock:
+        _cancel_requested.add(job.id)
+    job.cancel_requested = True
+    if job.status == PENDING:
+        job.status = CANCELLED
+        job.message = "已取消"
+        job.finished_at = datetime.utcnow()
+    db.commit()
+
+
+def recover_interrupted() -> int:
+    """服务启动时将上次未完成的任务标记为失败，返回处理的任务数"""
+    with SessionLocal() as db:
+        count = (
+            db.query(models.Job)
+            .filter(models.Job.status.in_([PENDING, RUNNING]))
+            .update(
+                {"status": FAILED, "error": "服务重启，任务已中断", "finished_at": datetime.utcnow()},
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+    return count
+
+
+def purge_expired() -> int:
+    """服务启动时删除结束超过保留期的任务及其结果文件，并清理没有任务记录的残留文件
+
+    返回删除的任务数。
+    """
+    cutoff = datetime.utcnow() - timedelta(days=_RETENTION_DAYS)
+    with SessionLocal() as db:
+        expired = (
+            db.query(models.Job.id)
+            .filter(
+                models.Job.status.in_(FINISHED_STATUSES),
+                func.coalesce(models.Job.finished_at, models.Job.created_at) < cutoff,
+            )
+        )
+        count = db.query(models.Job).filter(models.Job.id.in_(expired.scalar_subquery())).delete(
+            synchronize_session=False
+        )
+        db.commit()
+        remaining = {job_id for (job_id,) in db.query(models.Job.id)}
+
+    # 结果文件以任务 ID 命名，任务记录已删除（或从未写入）的文件一并删除
+    directory = get_data_dir() / "jobs"
+    if directory.exists():
+        for path in directory.iterdir():
+            if path.is_file() and path.name.split(".", 1)[0] not in remaining:
+                try:
+                    path.unlink()
+                except OSError:
+                    logger.warning("无法删除过期的任务文件: %s", path)
+    return count
@@ -13,7 +13,8 @@ from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
 from .database import init_db, get_data_dir
-from .routes import invite_codes, members, query_codes, students, points, auth, activation_codes, points_admin, pet_images, points_kv
+from .jobs import purge_expired, recover_interrupted
+from .routes import invite_codes, members, query_codes, students, points, auth, activation_codes, points_admin, pet_images, points_kv, jobs
 
 app = FastAPI(
     title="学校成绩管理系统",
@@ -27,6 +28,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Next-Cursor"],
 )
 
 app.include_router(auth.router)
@@ -39,6 +41,7 @@ app.include_router(points.router)
 app.include_router(points_admin.router)
 app.include_router(pet_images.router)
 app.include_router(points_kv.router)
+app.include_router(jobs.router)
 
 STATIC_DIR = Path(__file__).parent / "static"
 INDEX_FILE = STATIC_DIR / "grades.html"
@@ -50,6 +53,8 @@ if STATIC_DIR.exists():
 @app.on_event("startup")
 def startup_event():
     init_db()
+    recover_interrupted()
+    purge_expired()
 
 
 @app.get("/", include_in_schema=False)
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, UniqueConstraint, JSON, Text
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, String, UniqueConstraint, JSON, Text
 from sqlalchemy.orm import relationship
 
 from .database import Base
@@ -67,23 +67,90 @@ class QueryCode(Base, TimestampMixin):
     member = relationship("Member", back_populates="query_codes")
 
 
+class Exam(Base, TimestampMixin):
+    """考试维度表（名称唯一），由 students.exam_name 派生，随成绩写入同步维护"""
+    __tablename__ = "exams"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(120), nullable=False, unique=True)
+    exam_date = Column(DateTime, nullable=True)  # 该考试记录中最早的考试日期
+    grade_name = Column(String(80), nullable=True)  # 仅一个年级参加时填写
+    subjects = Column(JSON, nullable=False, default=list)
+    is_published = Column(Boolean, nullable=False, default=False, server_default="0")
+
+
 class Student(Base, TimestampMixin):
     __tablename__ = "students"
-    __table_args__ = (UniqueConstraint("student_no", "exam_name", name="uq_student_exam"),)
+    __table_args__ = (
+        UniqueConstraint("student_no", "exam_name", name="uq_student_exam"),
+        Index("ix_students_exam_grade_class", "exam_name", "grade_name", "class_name"),
+        Index("ix_students_class_student_gender", "class_name", "student_no", "gender"),
+        # 学生列表按 (updated_at, id) 键集分页；排名、exam_id、class_id 等派生列批量回填时
+        # 保留 updated_at 原值（updated_at=student.updated_at），不打乱列表顺序与分页游标
+        Index("ix_students_updated_at_id", "updated_at", "id"),
+        Index("ix_students_student_no_exam_date", "student_no", "exam_date", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(80), nullable=False)
     student_no = Column(String(50), nullable=False, index=True)
     class_name = Column(String(80), nullable=True)
+    class_id = Column(Integer, ForeignKey("points_classes.id"), nullable=True, index=True)
     grade_name = Column(String(80), nullable=True)
     exam_name = Column(String(120), nullable=True)
+    exam_id = Column(Integer, ForeignKey("exams.id"), nullable=True, index=True)
     exam_date = Column(DateTime, nullable=True)
     gender = Column(String(10), nullable=True)
     notes = Column(String(255), nullable=True)
     scores = Column(JSON, nullable=False, default=list)
+    # 由 scores 派生的汇总列，随每次写入同步更新，供统计接口直接在 SQL 中过滤/排序/聚合
+    total_score = Column(Float, nullable=False, default=0.0, server_default="0", index=True)
+    average_score = Column(Float, nullable=False, default=0.0, server_default="0", index=True)
+    score_count = Column(Integer, nullable=False, default=0, server_default="0", index=True)
     class_rank = Column(Integer, nullable=True)
     grade_rank = Column(Integer, nullable=True)
 
+    score_items = relationship("StudentScore", back_populates="student", cascade="all, delete-orphan")
+
+
+class StudentScore(Base):
+    """学生单科成绩表（与 Student.scores 同步写入，用于按科目的 SQL 统计）"""
+    __tablename__ = "student_scores"
+    __table_args__ = (
+        Index("ix_student_scores_subject_score", "subject", "score"),
+        Index("ix_student_scores_student_subject", "student_id", "subject"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
+    subject = Column(String(64), nullable=False)
+    score = Column(Float, nullable=False)
+
+    student = relationship("Student", back_populates="score_items")
+
+
+class ExamStat(Base):
+    """考试/年级/班级维度的成绩统计（随学生记录写入增量维护）
+
+    键列中的空字符串表示未填写（students 表中的 NULL）。
+    """
+    __tablename__ = "exam_stats"
+    __table_args__ = (
+        UniqueConstraint("exam_name", "grade_name", "class_name", name="uq_exam_stats_key"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    exam_name = Column(String(120), nullable=False, default="")
+    grade_name = Column(String(80), nullable=False, default="")
+    class_name = Column(String(80), nullable=False, default="", index=True)
+    record_count = Column(Integer, nullable=False, default=0)  # 全部记录数
+    student_count = Column(Integer, nullable=False, default=0)  # 有成绩的记录数
+    average_sum = Column(Float, nullable=False, default=0.0)
+    pass_count = Column(Integer, nullable=False, default=0)
+    good_count = Column(Integer, nullable=False, default=0)
+    excellent_count = Column(Integer, nullable=False, default=0)
+    first_created_at = Column(DateTime, nullable=True)
+
 
 class SubjectRange(Base, TimestampMixin):
     __tablename__ = "subject_ranges"
@@ -94,7 +161,7 @@ class SubjectRange(Base, TimestampMixin):
 
 
 class PointsClass(Base, TimestampMixin):
-    """积分系统班级表"""
+    """班级表（成绩系统与积分系统共用，students.class_id 指向此表）"""
     __tablename__ = "points_classes"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -231,3 +298,21 @@ class Session(Base, TimestampMixin):
     user_agent = Column(String(255), nullable=True)
 
     member = relationship("Member", backref="sessions")
+
+
+class Job(Base, TimestampMixin):
+    """后台任务（导入、导出、恢复、排名计算等耗时操作）"""
+    __tablename__ = "jobs"
+
+    id = Column(String(32), primary_key=True)
+    kind = Column(String(40), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default="pending", index=True)  # pending/running/succeeded/failed/cancelled
+    progress = Column(Float, nullable=False, default=0.0)
+    message = Column(String(255), nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    result_file = Column(String(255), nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    member_id = Column(Integer, ForeignKey("members.id"), nullable=True, index=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -0,0 +1,120 @@
+"""
+学生进步/退步分析
+
+每名学生的首次与最近一次考试由 SQL 窗口函数 ROW_NUMBER() 选出（按考试日期、录入时间
+排序），也可以指定两场考试对比；前 N 名用有界堆选取，不对全部学生排序。
+"""
+from __future__ import annotations
+
+import heapq
+from operator import itemgetter
+from typing import List, Optional
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+
+
+def _ranked_records(
+    class_name: Optional[str],
+    exam_names: Optional[List[str]] = None,
+    grade_name: Optional[str] = None,
+):
+    """有成绩的记录，附带每名学生内按考试先后的序号 rn 与考试次数 cnt"""
+    student = models.Student
+    # 未填写考试日期的记录以录入时间代替
+    exam_order = (func.coalesce(student.exam_date, student.created_at), student.created_at, student.id)
+    filters = [student.score_count > 0]
+    if class_name:
+        filters.append(student.class_name == class_name)
+    if exam_names:
+        filters.append(student.exam_name.in_(exam_names))
+    if grade_name:
+        filters.append(student.grade_name == grade_name)
+    return (
+        select(
+            student.student_no,
+            student.name,
+            student.class_name,
+            student.exam_name,
+            student.average_score,
+            func.row_number().over(partition_by=student.student_no, order_by=exam_order).label("rn"),
+            func.count().over(partition_by=student.student_no).label("cnt"),
+        )
+        .where(*filters)
+        .subquery()
+    )
+
+
+def build_progress_analysis(
+    db: Session,
+    limit: int,
+    class_name: Optional[str] = None,
+    from_exam: Optional[str] = None,
+    to_exam: Optional[str] = None,
+    grade_name: Optional[str] = None,
+) -> schemas.ProgressAnalysis:
+    """进步/退步排行榜
+
+    默认比较每名学生最早与最近一次考试的平均分（至少参加两次考试）；同时给出
+    from_exam 与 to_exam 时比较这两场考试，只统计两场都参加的学生；只给出 to_exam 时
+    比较最早一次考试与 to_exam。grade_name 只统计该年级的考试记录。
+    """
+    if from_exam and to_exam:
+        ranked = _ranked_records(class_name, [from_exam, to_exam], grade_name)
+        first = ranked.alias("first")
+        latest = ranked.alias("latest")
+        join_on = and_(first.c.student_no == latest.c.student_no, latest.c.exam_name == to_exam)
+        first_filter = first.c.exam_name == from_exam
+    elif to_exam:
+        ranked = _ranked_records(class_name, grade_name=grade_name)
+        first = ranked.alias("first")
+        latest = ranked.alias("latest")
+        join_on = and_(first.c.student_no == latest.c.student_no, latest.c.exam_name == to_exam)
+        first_filter = and_(first.c.rn == 1, latest.c.rn > 1)
+    else:
+        ranked = _ranked_records(class_name, grade_name=grade_name)
+        first = ranked.alias("first")
+        latest = ranked.alias("latest")
+        join_on = and_(first.c.student_no == latest.c.student_no, latest.c.rn == latest.c.cnt)
+        first_filter = and_(first.c.rn == 1, first.c.cnt >= 2)
+
+    rows = db.execute(
+        select(
+            first.c.student_no,
+            first.c.name,
+            first.c.class_name,
+            first.c.exam_name.label("first_exam"),
+            first.c.average_score.label("first_score"),
+            latest.c.exam_name.label("latest_exam"),
+            latest.c.average_score.label("latest_score"),
+        )
+        .join_from(first, latest, join_on)
+        .where(first_filter)
+        .order_by(first.c.student_no)
+    )
+
+    # 候选只保存原始行，nlargest / nsmallest 内部维护大小为 limit 的堆，O(n log limit)
+    candidates = [(round(row.latest_score - row.first_score, 2), row) for row in rows]
+    by_progress = itemgetter(0)
+    return schemas.ProgressAnalysis(
+        top_progress=[_progress_student(row) for _, row in heapq.nlargest(limit, candidates, key=by_progress)],
+        top_regress=[_progress_student(row) for _, row in heapq.nsmallest(limit, candidates, key=by_progress)],
+    )
+
+
+def _progress_student(row) -> schemas.ProgressStudent:
+    progress = row.latest_score - row.first_score
+    progress_rate = (progress / row.first_score * 100) if row.first_score > 0 else 0
+    return schemas.ProgressStudent(
+        student_no=row.student_no,
+        name=row.name,
+        class_name=row.class_name,
+        first_exam=row.first_exam or "未命名考试",
+        first_score=round(row.first_score, 2),
+        latest_exam=row.latest_exam or "未命名考试",
+        latest_score=round(row.latest_score, 2),
+        progress=round(progress, 2),
+        progress_rate=round(progress_rate, 2),
+    )
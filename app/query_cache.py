@@ -0,0 +1,106 @@
+"""
+进程内查询结果缓存
+
+TTLCache 为带容量上限的 LRU 缓存，条目在 TTL 到期或 students 表数据版本变化后失效。
+数据版本由 Session 事件维护：事务中任何 ORM flush 或 insert/update/delete 语句写入了
+students 表，提交后版本号加一，之前缓存的结果随即作废。
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from . import models
+
+MISSING = object()
+
+_STUDENTS_TABLE = models.Student.__tablename__
+_DIRTY_FLAG = "students_dirty"
+
+_version_lock = threading.Lock()
+_students_version = 0
+
+
+def students_version() -> int:
+    """students 表当前数据版本号（进程内单调递增）"""
+    return _students_version
+
+
+def bump_students_version() -> None:
+    global _students_version
+    with _version_lock:
+        _students_version += 1
+
+
+class TTLCache:
+    """线程安全的 TTL + LRU 缓存，只返回与当前 students 数据版本一致的条目"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, version, value = entry
+            if expires_at < time.monotonic() or version != _students_version:
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, version: int) -> None:
+        """version 须为读取数据之前取得的 students_version()，避免并发写入后缓存旧结果"""
+        if version != _students_version:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, version, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+def _writes_students(state: ORMExecuteState) -> bool:
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return False
+    table = getattr(state.statement, "table", None)
+    return getattr(table, "name", None) == _STUDENTS_TABLE
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_statement(state: ORMExecuteState) -> None:
+    if _writes_students(state):
+        state.session.info[_DIRTY_FLAG] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session: Session, flush_context) -> None:
+    if any(
+        isinstance(obj, models.Student)
+        for obj in (*session.new, *session.dirty, *session.deleted)
+    ):
+        session.info[_DIRTY_FLAG] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    if session.info.pop(_DIRTY_FLAG, False):
+        bump_students_version()
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_on_rollback(session: Session) -> None:
+    session.info.pop(_DIRTY_FLAG, None)
@@ -0,0 +1,66 @@
+"""
+科目区间配置的进程内缓存
+
+subject_ranges 表很小且极少修改，首次读取时整表加载并常驻内存，之后各统计接口读取
+区间配置和分数线时不再访问数据库。修改配置或从备份恢复后调用 invalidate()，版本号
+加一并丢弃缓存，下次读取时重新加载。
+
+返回的配置对象为共享数据，调用方不得修改。
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .scoring import rate_thresholds
+
+Thresholds = Tuple[float, float, float]
+
+_lock = threading.Lock()
+_version = 0
+# (配置, 分数线)，None 表示尚未加载
+_cache: Optional[Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, Thresholds]]] = None
+
+
+def version() -> int:
+    """区间配置当前版本号（进程内单调递增）"""
+    return _version
+
+
+def invalidate() -> None:
+    global _version, _cache
+    with _lock:
+        _version += 1
+        _cache = None
+
+
+def _load(db: Session):
+    global _cache
+    cache = _cache
+    if cache is not None:
+        return cache
+    loaded_version = _version
+    configs = {record.subject: record.config for record in db.query(models.SubjectRange)}
+    cache = (configs, {subject: rate_thresholds(config) for subject, config in configs.items()})
+    with _lock:
+        # 加载期间配置被修改时不缓存读到的旧数据
+        if loaded_version == _version:
+            _cache = cache
+    return cache
+
+
+def all_configs(db: Session) -> Dict[str, List[Dict[str, Any]]]:
+    return _load(db)[0]
+
+
+def get_config(db: Session, subject: str, default: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return _load(db)[0].get(subject, default)
+
+
+def thresholds(db: Session, subject: str, default: List[Dict[str, Any]]) -> Thresholds:
+    """科目的 (及格线, 良好线, 优秀线)，未配置时按 default 区间计算"""
+    cached = _load(db)[1].get(subject)
+    return cached if cached is not None else rate_thresholds(default)
@@ -0,0 +1,121 @@
+"""
+年级/班级排名计算（窗口函数 + 批量 UPDATE ... FROM）
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import case, func, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# (考试名称, 年级名称)，排名计算的最小分区
+Partition = Tuple[str, str]
+
+# 串行执行后台重算，避免并发写同一个 SQLite 文件
+_recompute_lock = threading.Lock()
+
+
+def recompute_ranks(
+    db: Session,
+    exam_name: Optional[str] = None,
+    grade_name: Optional[str] = None,
+    partitions: Optional[Iterable[Partition]] = None,
+) -> int:
+    """按总分计算年级排名与班级排名，返回写入排名的记录数
+
+    同分并列（RANK() 竞赛排名，如 1, 2, 2, 4）；只为总分大于 0 的记录排名，
+    未填写考试或年级的记录不参与。可通过 exam_name / grade_name 或
+    partitions 只重算指定分区。
+    """
+    student = models.Student
+    order = student.total_score.desc()
+    filters = [
+        student.exam_name.isnot(None),
+        student.exam_name != "",
+        student.grade_name.isnot(None),
+        student.grade_name != "",
+        student.total_score > 0,
+    ]
+    if exam_name:
+        filters.append(student.exam_name == exam_name)
+    if grade_name:
+        filters.append(student.grade_name == grade_name)
+    if partitions is not None:
+        partitions = list(partitions)
+        if not partitions:
+            return 0
+        filters.append(tuple_(student.exam_name, student.grade_name).in_(partitions))
+
+    ranked = (
+        select(
+            student.id.label("id"),
+            func.rank()
+            .over(partition_by=(student.exam_name, student.grade_name), order_by=order)
+            .label("grade_rank"),
+            func.rank()
+            .over(partition_by=(student.exam_name, student.grade_name, student.class_name), order_by=order)
+            .label("class_rank"),
+            student.class_name.label("class_name"),
+        )
+        .where(*filters)
+        .subquery()
+    )
+
+    result = db.execute(
+        update(student)
+        .where(student.id == ranked.c.id)
+        .values(
+            grade_rank=ranked.c.grade_rank,
+            # 未分班的记录保留原有班级排名
+            class_rank=case(
+                (func.coalesce(ranked.c.class_name, "") != "", ranked.c.class_rank),
+                else_=student.class_rank,
+            ),
+            updated_at=student.updated_at,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount or 0
+
+
+def dirty_partitions(keys: Iterable[Tuple[Optional[str], Optional[str], Optional[str]]]) -> Set[Partition]:
+    """从写入涉及的 (考试, 年级, 班级) 键中提取需要重算排名的分区"""
+    return {(exam_name, grade_name) for exam_name, grade_name, _ in keys if exam_name and grade_name}
+
+
+def recompute_partitions(
+    partitions: Iterable[Partition],
+    overrides: Optional[Dict[int, Dict[str, int]]] = None,
+) -> None:
+    """后台任务：写入提交后，在独立会话中只重算受影响分区的排名
+
+    overrides 为 {学生 id: {"class_rank": ..., "grade_rank": ...}}，重算后写回这些手动指定的排名。
+    """
+    partitions = set(partitions)
+    if not partitions:
+        return
+    with _recompute_lock:
+        db = SessionLocal()
+        try:
+            recompute_ranks(db, partitions=partitions)
+            student = models.Student
+            for student_id, values in (overrides or {}).items():
+                db.execute(
+                    update(student)
+                    .where(student.id == student_id)
+                    .values(**values, updated_at=student.updated_at)
+                    .execution_options(synchronize_session=False)
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("重算排名失败: %s", sorted(partitions))
+        finally:
+            db.close()
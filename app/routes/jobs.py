@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List
+from urllib.parse import quote
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from .. import jobs, models, schemas
+from ..database import get_db
+from ..dependencies import get_active_member
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+
+def _get_job(db: Session, job_id: str, current_user: models.Member) -> models.Job:
+    job = db.get(models.Job, job_id)
+    # 只能查看自己提交的任务，管理员可查看全部
+    if not job or (job.member_id != current_user.id and current_user.vip_level < 3):
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+
+def _serialize_job(job: models.Job) -> schemas.Job:
+    data = schemas.Job.model_validate(job)
+    live = jobs.live_progress(job.id) if job.status == jobs.RUNNING else None
+    if live:
+        data.progress, data.message = live
+    return data
+
+
+@router.get("/", response_model=List[schemas.Job])
+def list_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: models.Member = Depends(get_active_member),
+):
+    """当前用户最近提交的任务"""
+    query = (
+        db.query(models.Job)
+        .filter(models.Job.member_id == current_user.id)
+        .order_by(models.Job.created_at.desc())
+        .limit(limit)
+    )
+    return [_serialize_job(job) for job in query]
+
+
+@router.get("/{job_id}", response_model=schemas.Job)
+def get_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.Member = Depends(get_active_member),
+):
+    """查询任务状态与进度"""
+    return _serialize_job(_get_job(db, job_id, current_user))
+
+
+@router.post("/{job_id}/cancel", response_model=schemas.Job)
+def cancel_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.Member = Depends(get_active_member),
+):
+    """取消任务"""
+    job = _get_job(db, job_id, current_user)
+    if job.status in jobs.FINISHED_STATUSES:
+        raise HTTPException(status_code=400, detail="任务已结束，无法取消")
+    jobs.request_cancel(db, job)
+    return _serialize_job(job)
+
+
+@router.get("/{job_id}/download")
+def download_job_result(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.Member = Depends(get_active_member),
+):
+    """下载任务生成的结果文件（如导出的 Excel）"""
+    job = _get_job(db, job_id, current_user)
+    if job.status != jobs.SUCCEEDED or not job.result_file or not Path(job.result_file).exists():
+        raise HTTPException(status_code=404, detail="任务没有可下载的结果文件")
+    filename = (job.result or {}).get("filename") or Path(job.result_file).name
+    return FileResponse(
+        job.result_file,
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"},
+    )
@@ -25,40 +25,22 @@ def get_classes(
     current_user: Member = Depends(get_active_member),
 ):
     """获取所有班级列表（包含成绩系统的班级）"""
-    # 从成绩系统获取所有班级
-    grade_classes = db.query(Student.class_name, Student.grade_name).filter(
-        Student.class_name.isnot(None)
-    ).distinct().all()
-
-    # 确保这些班级在积分系统中存在
-    for class_name, grade_name in grade_classes:
-        if not class_name:
-            continue
-
-        existing = db.query(PointsClass).filter(
-            PointsClass.class_name == class_name
-        ).first()
-
-        if not existing:
-            new_class = PointsClass(
-                class_name=class_name,
-                grade_name=grade_name,
-                is_active=True
-            )
-            db.add(new_class)
-
-    db.commit()
-
-    # 返回所有积分系统班级
+    # 成绩系统与积分系统共用班级表，成绩写入时已登记新班级，这里直接读取
     classes = db.query(PointsClass).filter(PointsClass.is_active == True).all()
+    student_counts = dict(
+        db.query(PointsStudent.class_id, func.count(PointsStudent.id)).group_by(PointsStudent.class_id)
+    )
+    group_counts = dict(
+        db.query(PointsGroup.class_id, func.count(PointsGroup.id)).group_by(PointsGroup.class_id)
+    )
     return [
         {
             "id": c.id,
             "class_name": c.class_name,
             "grade_name": c.grade_name,
             "teacher_name": c.teacher_name,
-            "student_count": len(c.students),
-            "group_count": len(c.groups),
+            "student_count": student_counts.get(c.id, 0),
+            "group_count": group_counts.get(c.id, 0),
         }
         for c in classes
     ]
@@ -230,7 +212,7 @@ def sync_students_from_grades(class_id: int, db: Session = Depends(get_db)):
     # 从成绩系统获取该班级的学生
     grade_students = (
         db.query(Student)
-        .filter(Student.class_name == points_class.class_name)
+        .filter(Student.class_id == class_id)
         .order_by(Student.updated_at.desc())
         .all()
     )
@@ -1,17 +1,24 @@
 from __future__ import annotations
 
+import base64
+import json
+import os
+import shutil
+import tempfile
 from typing import List, Optional, Dict, Any
-from io import BytesIO
+from urllib.parse import quote
 
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Response, UploadFile, File, Form
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import func, or_, select, tuple_
 from openpyxl import Workbook, load_workbook
 
-from .. import models, schemas
+from .. import backup, bulk_import, class_catalog, critical_students, dashboard, exam_analytics, exam_catalog, exam_snapshots, grade_stats, jobs, models, progress_analysis, query_cache, range_config, ranking, schemas, student_search
 from ..database import get_db
-from ..dependencies import get_active_member, get_admin_user
+from ..dependencies import get_active_member, get_admin_user, get_optional_user
+from ..scoring import explode_scores, rate_thresholds, summarize_scores
 from ..utils import generate_code
 from datetime import datetime, timedelta
 
@@ -24,6 +31,21 @@ DEFAULT_RANGE_CONFIG = [
     {"key": "good", "name": "良好", "min": 80, "max": 90},
     {"key": "excellent", "name": "优秀", "min": 90, "max": 100},
 ]
+# 公开成绩查询结果缓存：容量与有效期（students 表有写入时立即失效）
+_public_query_cache = query_cache.TTLCache(maxsize=2048, ttl=60)
+# 看板数据缓存：键含区间配置版本，students 表有写入时立即失效
+_dashboard_cache = query_cache.TTLCache(maxsize=256, ttl=300)
+# 标准分缓存：按 (考试, 年级) 分区保存整个分区的计算结果（students 表有写入时立即失效）
+_standard_scores_cache = query_cache.TTLCache(maxsize=64, ttl=600)
+# 导出标准分列的科目（各科及总分）
+_STANDARD_SCORE_SUBJECTS = DEFAULT_SUBJECTS + [exam_analytics.TOTAL_SUBJECT]
+# 查询码最近使用时间的最小更新间隔
+_QUERY_CODE_TOUCH_INTERVAL = timedelta(minutes=1)
+# 学生列表分页的单页上限
+_MAX_PAGE_SIZE = 1000
+# 导出时每批从数据库读取的行数，以及流式返回文件的分块大小
+_EXPORT_BATCH = 1000
+_STREAM_CHUNK_SIZE = 64 * 1024
 
 
 @router.get("/{student_id}/point-records")
@@ -75,10 +97,18 @@ def get_student_point_records(
 
 
 
+def _apply_scores(student: models.Student, scores: Optional[List[Dict[str, Any]]]) -> None:
+    """写入成绩并同步持久化的总分/均分/科目数及 student_scores 单科成绩行"""
+    student.scores = scores or []
+    student.total_score, student.average_score, student.score_count = summarize_scores(student.scores)
+    student.score_items = [
+        models.StudentScore(subject=subject, score=score)
+        for subject, score in explode_scores(student.scores)
+    ]
+
+
 def _serialize_student(student: models.Student) -> schemas.Student:
     scores = student.scores or []
-    total = sum(item.get("score", 0) for item in scores)
-    average = total / len(scores) if scores else 0.0
     return schemas.Student(
         id=student.id,
         name=student.name,
@@ -91,8 +121,8 @@ def _serialize_student(student: models.Student) -> schemas.Student:
         scores=[schemas.ScoreItem(**item) for item in scores],
         class_rank=student.class_rank,
         grade_rank=student.grade_rank,
-        total_score=round(total, 2),
-        average_score=round(average, 2),
+        total_score=round(student.total_score or 0.0, 2),
+        average_score=round(student.average_score or 0.0, 2),
         created_at=student.created_at,
         updated_at=student.updated_at,
     )
@@ -100,67 +130,172 @@ def _serialize_student(student: models.Student) -> schemas.Student:
 
 @router.get("/", response_model=List[schemas.Student])
 def list_students(
+    response: Response,
     keyword: Optional[str] = Query(None, description="按姓名/学号模糊搜索"),
     class_name: Optional[str] = None,
     exam_name: Optional[str] = None,
+    subject: Optional[str] = Query(None, description="按单科成绩筛选的科目"),
+    min_score: Optional[float] = Query(None, description="单科最低分（含）"),
+    max_score: Optional[float] = Query(None, description="单科最高分（含）"),
+    limit: Optional[int] = Query(None, ge=1, le=_MAX_PAGE_SIZE, description="每页条数，不传则返回全部"),
+    cursor: Optional[str] = Query(None, description="上一页响应头 X-Next-Cursor 的值"),
+    fields: Optional[str] = Query(None, description="只返回指定字段，逗号分隔，如 id,name,student_no,class_name"),
     db: Session = Depends(get_db),
     current_user: models.Member = Depends(get_active_member),
 ):
-    query = db.query(models.Student)
+    projection = _parse_fields(fields)
+    filters = []
+    if subject:
+        subject_query = db.query(models.StudentScore.student_id).filter(models.StudentScore.subject == subject)
+        if min_score is not None:
+            subject_query = subject_query.filter(models.StudentScore.score >= min_score)
+        if max_score is not None:
+            subject_query = subject_query.filter(models.StudentScore.score <= max_score)
+        filters.append(models.Student.id.in_(subject_query))
     if keyword:
-        like = f"%{keyword}%"
-        query = query.filter(
-            or_(
-                models.Student.name.ilike(like),
-                models.Student.student_no.ilike(like),
-            )
-        )
+        filters.append(student_search.keyword_filter(db, keyword))
     if class_name:
-        query = query.filter(models.Student.class_name == class_name)
+        filters.append(class_catalog.class_filter(class_name))
     if exam_name:
-        query = query.filter(models.Student.exam_name == exam_name)
-    students = query.order_by(models.Student.updated_at.desc()).all()
-    return [_serialize_student(s) for s in students]
+        filters.append(exam_catalog.exam_filter(exam_name))
+
+    if projection:
+        columns = [getattr(models.Student, field) for field in projection]
+        query = db.query(*columns, models.Student.id.label("_id"), models.Student.updated_at.label("_updated_at"))
+    else:
+        query = db.query(models.Student)
+    query = query.filter(*filters)
+    if cursor:
+        updated_at, student_id = _decode_cursor(cursor)
+        query = query.filter(tuple_(models.Student.updated_at, models.Student.id) < tuple_(updated_at, student_id))
+    # (updated_at, id) 复合索引上的键集分页，翻页代价与页码无关
+    query = query.order_by(models.Student.updated_at.desc(), models.Student.id.desc())
+
+    headers: Dict[str, str] = {}
+    if limit is None:
+        rows = query.all()
+        headers["X-Total-Count"] = str(len(rows))
+    else:
+        rows = query.limit(limit + 1).all()
+        # 总数单独计数，不受游标影响
+        headers["X-Total-Count"] = str(
+            db.query(func.count(models.Student.id)).filter(*filters).scalar() or 0
+        )
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            headers["X-Next-Cursor"] = (
+                _encode_cursor(last._updated_at, last._id) if projection else _encode_cursor(last.updated_at, last.id)
+            )
+
+    if projection:
+        return JSONResponse(
+            content=jsonable_encoder([_project_student(row, projection) for row in rows]),
+            headers=headers,
+        )
+    response.headers.update(headers)
+    return [_serialize_student(s) for s in rows]
+
+
+def _parse_fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return []
+    projection = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in projection if field not in schemas.Student.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"不支持的字段：{', '.join(unknown)}")
+    return projection
+
+
+def _project_student(row: Any, projection: List[str]) -> Dict[str, Any]:
+    """按 fields 投影输出，成绩与总分/均分的取值口径与 _serialize_student 一致"""
+    item: Dict[str, Any] = {}
+    for field in projection:
+        value = getattr(row, field)
+        if field == "scores":
+            value = value or []
+        elif field in ("total_score", "average_score"):
+            value = round(value or 0.0, 2)
+        item[field] = value
+    return item
+
+
+def _encode_cursor(updated_at: datetime, student_id: int) -> str:
+    raw = f"{updated_at.isoformat()}|{student_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        updated_at, student_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(updated_at), int(student_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
 
 
 @router.get("/exams")
 def get_exams(db: Session = Depends(get_db)):
     """获取所有考试场次列表（公开接口，无需认证）"""
-    exams = db.query(models.Student.exam_name).filter(
-        models.Student.exam_name.isnot(None)
-    ).distinct().order_by(models.Student.exam_name.desc()).all()
+    # 已发布但成绩已删除的考试仍保留在 exams 表中，列表只返回有成绩记录的考试
+    has_students = select(models.Student.id).where(models.Student.exam_id == models.Exam.id).exists()
+    exams = db.query(models.Exam.name).filter(has_students).order_by(models.Exam.name.desc()).all()
+    return [exam[0] for exam in exams]
 
-    return [exam[0] for exam in exams if exam[0]]
+
+@router.get("/filter-options", response_model=schemas.FilterOptions)
+def get_filter_options(db: Session = Depends(get_db)):
+    """筛选下拉框使用的考试、年级、班级列表，无需下载学生记录"""
+    return grade_stats.build_filter_options(db)
+
+
+@router.get("/exams/details", response_model=List[schemas.Exam])
+def get_exam_details(db: Session = Depends(get_db)):
+    """考试维度信息：考试日期、年级、科目及是否已发布，按考试日期倒序"""
+    return (
+        db.query(models.Exam)
+        .order_by(models.Exam.exam_date.desc().nulls_last(), models.Exam.name.desc())
+        .all()
+    )
 
 
 @router.get("/public-query")
 def public_query_student(
     keyword: str = Query(..., description="姓名或学号"),
     exam_name: Optional[str] = Query(None, description="考试场次，不传则返回该学生最新考试成绩"),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """公开查询接口：通过姓名/学号和考试场次查询成绩（无需认证）"""
-    like = f"%{keyword}%"
-    query = db.query(models.Student).filter(
-        or_(
-            models.Student.name.ilike(like),
-            models.Student.student_no.ilike(like),
-        )
-    )
-
-    # 如果指定了考试场次，则筛选
-    if exam_name:
-        query = query.filter(models.Student.exam_name == exam_name)
-
-    # 按创建时间倒序，获取最新的记录
-    students = query.order_by(models.Student.created_at.desc()).all()
-
-    if not students:
+    snapshot = exam_snapshots.get(exam_name)
+    if snapshot:
+        # 已发布的考试直接读取快照，不访问数据库
+        if if_none_match == snapshot.etag:
+            return Response(status_code=304, headers={"ETag": snapshot.etag})
+        record = snapshot.search(keyword)
+        if record is None:
+            raise HTTPException(status_code=404, detail="未找到匹配的学生成绩")
+        return JSONResponse(content=record, headers={"ETag": snapshot.etag})
+
+    cache_key = (keyword, exam_name)
+    cached = _public_query_cache.get(cache_key)
+    if cached is query_cache.MISSING:
+        version = query_cache.students_version()
+        query = db.query(models.Student).filter(student_search.keyword_filter(db, keyword))
+
+        # 如果指定了考试场次，则筛选
+        if exam_name:
+            query = query.filter(models.Student.exam_name == exam_name)
+
+        # 按创建时间倒序，只取最新的一条记录
+        student = query.order_by(models.Student.created_at.desc(), models.Student.id.desc()).first()
+        cached = _serialize_student(student) if student else None
+        # 未命中的结果同样缓存，避免反复查询不存在的学生
+        _public_query_cache.set(cache_key, cached, version)
+
+    if cached is None:
         raise HTTPException(status_code=404, detail="未找到匹配的学生成绩")
-
-    # 返回第一个匹配的学生（最新的考试记录）
-    student = students[0]
-    return _serialize_student(student)
+    return cached
 
 
 @router.get("/summary", response_model=schemas.StudentSummary)
@@ -171,211 +306,98 @@ def summary(
     db: Session = Depends(get_db)
 ):
     """获取学生统计摘要，支持按班级、考试筛选"""
-    query = db.query(models.Student)
+    filters = []
 
     # 应用筛选条件
     if keyword:
-        like = f"%{keyword}%"
-        query = query.filter(
-            or_(
-                models.Student.name.ilike(like),
-                models.Student.student_no.ilike(like),
-            )
-        )
+        filters.append(student_search.keyword_filter(db, keyword))
     if class_name:
-        query = query.filter(models.Student.class_name == class_name)
+        filters.append(class_catalog.class_filter(class_name))
     if exam_name:
-        query = query.filter(models.Student.exam_name == exam_name)
+        filters.append(exam_catalog.exam_filter(exam_name))
 
-    students = query.all()
-
-    if not students:
-        return schemas.StudentSummary(
-            total_students=0,
-            average_total=0.0,
-            highest_total=None,
-            highest_student=None,
-            pass_rate=0.0,
-            good_rate=0.0,
-            excellent_rate=0.0,
-        )
-
-    # 获取总分的成绩区间配置
-    total_score_range = _ensure_subject_range(db, "总分")
-    range_config = total_score_range.config
-
-    # 提取各等级的最小分数线
-    pass_min = next((r.get("min", 60) for r in range_config if r.get("key") == "pass"), 60)
-    good_min = next((r.get("min", 80) for r in range_config if r.get("key") == "good"), 80)
-    excellent_min = next((r.get("min", 90) for r in range_config if r.get("key") == "excellent"), 90)
-
-    totals = []
-    highest_total = None
-    highest_name = None
-    pass_count = 0
-    good_count = 0
-    excellent_count = 0
-    for student in students:
-        scores = student.scores or []
-        total = sum(item.get("score", 0) for item in scores)
-        totals.append(total)
-        if highest_total is None or total > highest_total:
-            highest_total = total
-            highest_name = student.name
-        avg = total / len(scores) if scores else 0
-        # 使用配置的分数线
-        if avg >= excellent_min:
-            excellent_count += 1
-        if avg >= good_min:
-            good_count += 1
-        if avg >= pass_min:
-            pass_count += 1
-    total_students = len(students)
-    average_total = sum(totals) / total_students if totals else 0
-    return schemas.StudentSummary(
-        total_students=total_students,
-        average_total=round(average_total, 2),
-        highest_total=round(highest_total, 2) if highest_total is not None else None,
-        highest_student=highest_name,
-        pass_rate=round(pass_count / total_students * 100, 2),
-        good_rate=round(good_count / total_students * 100, 2),
-        excellent_rate=round(excellent_count / total_students * 100, 2),
-    )
+    return grade_stats.build_summary(db, filters, _total_thresholds(db))
 
 
 @router.get("/class-stats", response_model=List[schemas.ClassStats])
 def get_class_stats(db: Session = Depends(get_db)):
-    students = db.query(models.Student).all()
-    if not students:
-        return []
-
-    # 获取总分的成绩区间配置
-    total_score_range = _ensure_subject_range(db, "总分")
-    range_config = total_score_range.config
-
-    # 提取各等级的最小分数线
-    pass_min = next((r.get("min", 60) for r in range_config if r.get("key") == "pass"), 60)
-    good_min = next((r.get("min", 80) for r in range_config if r.get("key") == "good"), 80)
-    excellent_min = next((r.get("min", 90) for r in range_config if r.get("key") == "excellent"), 90)
-
-    class_data = {}
-    for student in students:
-        class_name = student.class_name or "未分配班级"
-        if class_name not in class_data:
-            class_data[class_name] = {
-                "records": [],
-                "grade_name": student.grade_name,
-                "unique_students": set(),
-                "exams": set(),
-            }
-        class_data[class_name]["records"].append(student)
-        class_data[class_name]["unique_students"].add(student.student_no)
-        if student.exam_name:
-            class_data[class_name]["exams"].add(student.exam_name)
-
-    result = []
-    for class_name, data in class_data.items():
-        records = data["records"]
-        total_students = len(data["unique_students"])
-        exam_count = len(data["exams"]) if data["exams"] else 1
-
-        male_students = set()
-        female_students = set()
-        for record in records:
-            if record.gender == "男":
-                male_students.add(record.student_no)
-            elif record.gender == "女":
-                female_students.add(record.student_no)
-
-        male_count = len(male_students)
-        female_count = len(female_students)
-        male_ratio = round(male_count / total_students * 100, 2) if total_students > 0 else 0.0
-        female_ratio = round(female_count / total_students * 100, 2) if total_students > 0 else 0.0
-
-        total_avg = 0
-        pass_count = 0
-        good_count = 0
-        excellent_count = 0
-        valid_records = 0
-
-        for record in records:
-            scores = record.scores or []
-            if scores:
-                total = sum(item.get("score", 0) for item in scores)
-                avg = total / len(scores)
-                total_avg += avg
-                valid_records += 1
-
-                # 使用配置的分数线
-                if avg >= excellent_min:
-                    excellent_count += 1
-                if avg >= good_min:
-                    good_count += 1
-                if avg >= pass_min:
-                    pass_count += 1
-
-        average_score = round(total_avg / valid_records, 2) if valid_records > 0 else 0.0
-        pass_rate = round(pass_count / valid_records * 100, 2) if valid_records > 0 else 0.0
-        good_rate = round(good_count / valid_records * 100, 2) if valid_records > 0 else 0.0
-        excellent_rate = round(excellent_count / valid_records * 100, 2) if valid_records > 0 else 0.0
-
-        result.append(schemas.ClassStats(
-            class_name=class_name,
-            grade_name=data["grade_name"],
-            total_students=total_students,
-            exam_count=exam_count,
-            male_count=male_count,
-            female_count=female_count,
-            male_ratio=male_ratio,
-            female_ratio=female_ratio,
-            average_score=average_score,
-            pass_rate=pass_rate,
-            good_rate=good_rate,
-            excellent_rate=excellent_rate,
-        ))
-
-    return sorted(result, key=lambda x: (x.grade_name or "", x.class_name))
+    return grade_stats.build_class_stats(db)
 
 
 @router.put("/class/{class_name}/rename")
 def rename_class(
     class_name: str,
+    background_tasks: BackgroundTasks,
     new_class_name: str = Query(..., description="新班级名称"),
     new_grade_name: Optional[str] = Query(None, description="新年级名称"),
     db: Session = Depends(get_db)
 ):
-    """重命名班级（批量更新所有该班级的学生记录）"""
-    students = db.query(models.Student).filter(models.Student.class_name == class_name).all()
-
-    if not students:
+    """重命名班级（班级表改名，学生记录批量更新）"""
+    class_id = class_catalog.class_id_of(db, class_name)
+    old_keys = _class_stats_keys(db, class_id) if class_id else []
+    if not old_keys:
         raise HTTPException(status_code=404, detail="未找到该班级的学生")
 
-    for student in students:
-        student.class_name = new_class_name
+    target_id = class_catalog.class_id_of(db, new_class_name)
+    if target_id is None or target_id == class_id:
+        # 班级表中直接改名，积分系统同步看到新名称
+        values = {models.PointsClass.class_name: new_class_name}
         if new_grade_name is not None:
-            student.grade_name = new_grade_name
-        db.add(student)
+            values[models.PointsClass.grade_name] = new_grade_name
+        db.query(models.PointsClass).filter(models.PointsClass.id == class_id).update(values, synchronize_session=False)
+        target_id = class_id
+    # 新名称已是另一个班级时并入该班级，原班级行及其积分数据保留
+
+    values = {models.Student.class_name: new_class_name, models.Student.class_id: target_id}
+    if new_grade_name is not None:
+        values[models.Student.grade_name] = new_grade_name
+    updated = (
+        db.query(models.Student)
+        .filter(models.Student.class_id == class_id)
+        .update(values, synchronize_session=False)
+    )
 
+    stats_keys = set(old_keys)
+    stats_keys.update(
+        (exam_name, new_grade_name if new_grade_name is not None else grade_name, new_class_name)
+        for exam_name, grade_name, _ in old_keys
+    )
+    _refresh_exam_stats(db, stats_keys)
     db.commit()
-    return {"message": f"已更新 {len(students)} 条记录", "updated_count": len(students)}
+    _schedule_rank_refresh(background_tasks, stats_keys)
+    return {"message": f"已更新 {updated} 条记录", "updated_count": updated}
 
 
 @router.delete("/class/{class_name}")
-def delete_class(class_name: str, db: Session = Depends(get_db)):
+def delete_class(class_name: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """删除班级（删除该班级的所有学生记录）"""
-    students = db.query(models.Student).filter(models.Student.class_name == class_name).all()
-
-    if not students:
+    class_id = class_catalog.class_id_of(db, class_name)
+    stats_keys = _class_stats_keys(db, class_id) if class_id else []
+    if not stats_keys:
         raise HTTPException(status_code=404, detail="未找到该班级的学生")
 
-    count = len(students)
-    for student in students:
-        db.delete(student)
+    student_ids = select(models.Student.id).where(models.Student.class_id == class_id)
+    db.query(models.StudentScore).filter(models.StudentScore.student_id.in_(student_ids)).delete(
+        synchronize_session=False
+    )
+    count = db.query(models.Student).filter(models.Student.class_id == class_id).delete(synchronize_session=False)
 
+    _refresh_exam_stats(db, stats_keys)
     db.commit()
+    _schedule_rank_refresh(background_tasks, stats_keys)
     return {"message": f"已删除班级 {class_name} 及其 {count} 条学生记录", "deleted_count": count}
 
 
+def _class_stats_keys(db: Session, class_id: int):
+    """班级学生记录涉及的 (考试, 年级, 班级) 键"""
+    return (
+        db.query(models.Student.exam_name, models.Student.grade_name, models.Student.class_name)
+        .filter(models.Student.class_id == class_id)
+        .distinct()
+        .all()
+    )
+
+
 @router.post("/class/{class_name}/share")
 def create_class_share_code(
     class_name: str,
@@ -439,8 +461,15 @@ def query_student_by_code(
         db.commit()
         raise HTTPException(status_code=400, detail="查询码已过期")
 
-    query_code.last_used_at = datetime.utcnow()
-    db.commit()
+    # 最近使用时间按分钟粒度更新，避免每次查询都写库
+    now = datetime.utcnow()
+    if not query_code.last_used_at or now - query_code.last_used_at >= _QUERY_CODE_TOUCH_INTERVAL:
+        query_code.last_used_at = now
+        db.commit()
+
+    # 已发布考试的记录从快照中精确匹配，其余考试查询数据库
+    published = exam_snapshots.list_published()
+    results = [record for snapshot in published for record in snapshot.exact(keyword)]
 
     # 精确匹配查询：姓名或学号必须完全一致
     query = db.query(models.Student).filter(
@@ -449,22 +478,27 @@ def query_student_by_code(
             models.Student.student_no == keyword
         )
     )
+    if published:
+        query = query.filter(or_(
+            models.Student.exam_name.is_(None),
+            models.Student.exam_name.notin_([snapshot.exam_name for snapshot in published]),
+        ))
+    results.extend(jsonable_encoder(_serialize_student(s)) for s in query)
 
-    students = query.order_by(models.Student.created_at.desc()).all()
-
-    if not students:
+    if not results:
         raise HTTPException(status_code=404, detail="未找到匹配的学生，请检查姓名或学号是否正确")
 
-    return [_serialize_student(s) for s in students]
+    results.sort(key=lambda record: record["created_at"], reverse=True)
+    return results
 
 
 @router.get("/ranges", response_model=Dict[str, List[schemas.RangeSegment]])
 def get_all_ranges(db: Session = Depends(get_db)):
-    configs: Dict[str, List[schemas.RangeSegment]] = {}
-    for subject in ALL_SUBJECTS:
-        record = _ensure_subject_range(db, subject)
-        configs[subject] = [schemas.RangeSegment(**segment) for segment in record.config]
-    return configs
+    configs = range_config.all_configs(db)
+    return {
+        subject: [schemas.RangeSegment(**segment) for segment in configs.get(subject, DEFAULT_RANGE_CONFIG)]
+        for subject in ALL_SUBJECTS
+    }
 
 
 @router.put("/ranges/{subject}", response_model=List[schemas.RangeSegment])
@@ -481,258 +515,117 @@ def update_range(subject: str, payload: List[schemas.RangeSegment], db: Session
     record = _ensure_subject_range(db, subject)
     record.config = validated
     db.add(record)
+    if subject == "总分":
+        # 总分分数线变化后按新阈值重建考试统计
+        grade_stats.rebuild_exam_stats(db, rate_thresholds(validated))
     db.commit()
+    range_config.invalidate()
     db.refresh(record)
     return [schemas.RangeSegment(**segment) for segment in record.config]
 
 
+@router.get("/student-trends", response_model=List[schemas.StudentTrend])
+def get_student_trends(
+    class_name: Optional[str] = Query(None, description="返回该班级全部学生的走势"),
+    student_no: Optional[List[str]] = Query(None, description="学号，可重复传入多个"),
+    db: Session = Depends(get_db),
+):
+    """批量获取学生历次考试趋势，按学号排序"""
+    if not class_name and not student_no:
+        raise HTTPException(status_code=400, detail="请指定班级或学号")
+    return grade_stats.build_student_trends(db, student_nos=student_no, class_name=class_name)
+
+
 @router.get("/student-trend/{student_no}", response_model=schemas.StudentTrend)
 def get_student_trend(student_no: str, db: Session = Depends(get_db)):
     """获取学生的历次考试趋势数据"""
-    from datetime import datetime
-
-    records = db.query(models.Student).filter(models.Student.student_no == student_no).order_by(models.Student.created_at).all()
-
-    if not records:
+    trends = grade_stats.build_student_trends(db, student_nos=[student_no])
+    if not trends:
         raise HTTPException(status_code=404, detail="未找到该学生的考试记录")
-
-    first_record = records[0]
-    exams = []
-
-    for record in records:
-        scores = record.scores or []
-        total = sum(item.get("score", 0) for item in scores)
-        average = total / len(scores) if scores else 0.0
-
-        subject_scores = {item.get("subject"): item.get("score", 0) for item in scores}
-
-        exams.append(schemas.ExamTrendPoint(
-            exam_name=record.exam_name or "未命名考试",
-            exam_date=record.created_at,
-            total_score=round(total, 2),
-            average_score=round(average, 2),
-            subject_scores=subject_scores
-        ))
-
-    return schemas.StudentTrend(
-        student_no=student_no,
-        name=first_record.name,
-        class_name=first_record.class_name,
-        exams=exams
-    )
+    return trends[0]
 
 
 @router.get("/class-trend/{class_name}", response_model=schemas.ClassTrend)
 def get_class_trend(class_name: str, db: Session = Depends(get_db)):
     """获取班级的历次考试趋势数据"""
-    from datetime import datetime
-
-    records = db.query(models.Student).filter(models.Student.class_name == class_name).all()
-
-    if not records:
+    trend = grade_stats.build_class_trend(db, class_name)
+    if trend is None:
         raise HTTPException(status_code=404, detail="未找到该班级的考试记录")
-
-    # 获取总分的成绩区间配置
-    total_score_range = _ensure_subject_range(db, "总分")
-    range_config = total_score_range.config
-
-    # 提取各等级的最小分数线
-    pass_min = next((r.get("min", 60) for r in range_config if r.get("key") == "pass"), 60)
-    good_min = next((r.get("min", 80) for r in range_config if r.get("key") == "good"), 80)
-    excellent_min = next((r.get("min", 90) for r in range_config if r.get("key") == "excellent"), 90)
-
-    exam_data = {}
-    for record in records:
-        exam_name = record.exam_name or "未命名考试"
-        if exam_name not in exam_data:
-            exam_data[exam_name] = {
-                "records": [],
-                "exam_date": record.created_at,
-                "grade_name": record.grade_name
-            }
-        exam_data[exam_name]["records"].append(record)
-
-    trend_data = []
-    for exam_name, data in exam_data.items():
-        exam_records = data["records"]
-        total_avg = 0
-        pass_count = 0
-        good_count = 0
-        excellent_count = 0
-        valid_count = 0
-
-        for record in exam_records:
-            scores = record.scores or []
-            if scores:
-                total = sum(item.get("score", 0) for item in scores)
-                avg = total / len(scores)
-                total_avg += avg
-                valid_count += 1
-
-                # 使用配置的分数线
-                if avg >= excellent_min:
-                    excellent_count += 1
-                if avg >= good_min:
-                    good_count += 1
-                if avg >= pass_min:
-                    pass_count += 1
-
-        if valid_count > 0:
-            trend_data.append(schemas.ClassTrendPoint(
-                exam_name=exam_name,
-                exam_date=data["exam_date"],
-                average_score=round(total_avg / valid_count, 2),
-                pass_rate=round(pass_count / valid_count * 100, 2),
-                good_rate=round(good_count / valid_count * 100, 2),
-                excellent_rate=round(excellent_count / valid_count * 100, 2),
-                student_count=valid_count
-            ))
-
-    trend_data.sort(key=lambda x: x.exam_date if x.exam_date else datetime.min)
-
-    grade_name = exam_data[list(exam_data.keys())[0]]["grade_name"] if exam_data else None
-
-    return schemas.ClassTrend(
-        class_name=class_name,
-        grade_name=grade_name,
-        trend_data=trend_data
-    )
+    return trend
 
 
 @router.get("/progress-analysis", response_model=schemas.ProgressAnalysis)
 def get_progress_analysis(
     class_name: Optional[str] = Query(None, description="班级名称,为空则分析所有班级"),
     limit: int = Query(10, ge=1, le=50, description="返回TOP N学生"),
+    from_exam: Optional[str] = Query(None, description="对比的起始考试，需与 to_exam 同时指定"),
+    to_exam: Optional[str] = Query(None, description="对比的目标考试，为空则比较每名学生首次与最近一次考试"),
     db: Session = Depends(get_db)
 ):
     """获取进步/退步学生排行榜"""
-    query = db.query(models.Student)
-    if class_name:
-        query = query.filter(models.Student.class_name == class_name)
-
-    all_records = query.all()
-
-    student_data = {}
-    for record in all_records:
-        student_no = record.student_no
-        if student_no not in student_data:
-            student_data[student_no] = {
-                "name": record.name,
-                "class_name": record.class_name,
-                "exams": []
-            }
-
-        scores = record.scores or []
-        if scores:
-            total = sum(item.get("score", 0) for item in scores)
-            avg = total / len(scores)
-            student_data[student_no]["exams"].append({
-                "exam_name": record.exam_name or "未命名考试",
-                "score": avg,
-                "created_at": record.created_at
-            })
-
-    progress_list = []
-    for student_no, data in student_data.items():
-        exams = sorted(data["exams"], key=lambda x: x["created_at"])
-        if len(exams) >= 2:
-            first_exam = exams[0]
-            latest_exam = exams[-1]
-            progress = latest_exam["score"] - first_exam["score"]
-            progress_rate = (progress / first_exam["score"] * 100) if first_exam["score"] > 0 else 0
-
-            progress_list.append(schemas.ProgressStudent(
-                student_no=student_no,
-                name=data["name"],
-                class_name=data["class_name"],
-                first_exam=first_exam["exam_name"],
-                first_score=round(first_exam["score"], 2),
-                latest_exam=latest_exam["exam_name"],
-                latest_score=round(latest_exam["score"], 2),
-                progress=round(progress, 2),
-                progress_rate=round(progress_rate, 2)
-            ))
-
-    progress_list.sort(key=lambda x: x.progress, reverse=True)
-    top_progress = progress_list[:limit]
-
-    progress_list.sort(key=lambda x: x.progress)
-    top_regress = progress_list[:limit]
-
-    return schemas.ProgressAnalysis(
-        top_progress=top_progress,
-        top_regress=top_regress
-    )
+    if bool(from_exam) != bool(to_exam):
+        raise HTTPException(status_code=400, detail="from_exam 与 to_exam 需同时指定")
+    if from_exam and from_exam == to_exam:
+        raise HTTPException(status_code=400, detail="请选择两场不同的考试")
+    return progress_analysis.build_progress_analysis(db, limit, class_name, from_exam, to_exam)
 
 
 @router.get("/critical-students", response_model=schemas.CriticalStudents)
 def get_critical_students(
-    class_name: Optional[str] = Query(None, description="班级名称"),
+    class_name: Optional[List[str]] = Query(None, description="班级名称，可重复传入多个班级"),
+    grade_name: Optional[str] = Query(None, description="年级名称"),
     exam_name: Optional[str] = Query(None, description="考试名称"),
+    subject: str = Query("总分", description="按该科目的区间配置判断；总分按平均分判断"),
     threshold: float = Query(5.0, ge=0, le=20, description="临界阈值(分数)"),
     db: Session = Depends(get_db)
 ):
     """识别临界学生(接近及格/良好/优秀线的学生)"""
-    query = db.query(models.Student)
-    if class_name:
-        query = query.filter(models.Student.class_name == class_name)
-    if exam_name:
-        query = query.filter(models.Student.exam_name == exam_name)
-
-    records = query.all()
+    return critical_students.build_critical_students(
+        db,
+        _subject_thresholds(db, subject),
+        threshold,
+        subject=subject,
+        class_names=class_name,
+        grade_name=grade_name,
+        exam_name=exam_name,
+    )
 
-    near_pass = []
-    near_good = []
-    near_excellent = []
 
-    for record in records:
-        scores = record.scores or []
-        if not scores:
-            continue
-
-        total = sum(item.get("score", 0) for item in scores)
-        avg = total / len(scores)
-
-        if 60 - threshold <= avg < 60:
-            near_pass.append(schemas.CriticalStudent(
-                student_no=record.student_no,
-                name=record.name,
-                class_name=record.class_name,
-                exam_name=record.exam_name,
-                average_score=round(avg, 2),
-                distance_to_line=round(60 - avg, 2),
-                category="接近及格"
-            ))
-        elif 80 - threshold <= avg < 80:
-            near_good.append(schemas.CriticalStudent(
-                student_no=record.student_no,
-                name=record.name,
-                class_name=record.class_name,
-                exam_name=record.exam_name,
-                average_score=round(avg, 2),
-                distance_to_line=round(80 - avg, 2),
-                category="接近良好"
-            ))
-        elif 90 - threshold <= avg < 90:
-            near_excellent.append(schemas.CriticalStudent(
-                student_no=record.student_no,
-                name=record.name,
-                class_name=record.class_name,
-                exam_name=record.exam_name,
-                average_score=round(avg, 2),
-                distance_to_line=round(90 - avg, 2),
-                category="接近优秀"
-            ))
-
-    near_pass.sort(key=lambda x: x.distance_to_line)
-    near_good.sort(key=lambda x: x.distance_to_line)
-    near_excellent.sort(key=lambda x: x.distance_to_line)
-
-    return schemas.CriticalStudents(
-        near_pass=near_pass,
-        near_good=near_good,
-        near_excellent=near_excellent
-    )
+@router.get("/dashboard", response_model=schemas.Dashboard)
+def get_dashboard(
+    exam_name: Optional[str] = Query(None, description="考试名称"),
+    grade_name: Optional[str] = Query(None, description="年级名称"),
+    class_name: Optional[str] = Query(None, description="班级名称"),
+    limit: int = Query(10, ge=1, le=50, description="进步/退步排行返回TOP N学生"),
+    threshold: float = Query(5.0, ge=0, le=20, description="临界阈值(分数)"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """成绩分析看板：摘要、班级统计、班级对比、进步排行与临界学生一次返回
+
+    响应带 ETag（由数据版本与筛选参数派生），请求携带 If-None-Match 且数据未变化时返回 304。
+    """
+    version = dashboard.data_version()
+    params = (exam_name, grade_name, class_name, limit, threshold)
+    tag = dashboard.etag(version, params)
+    headers = {"ETag": tag, "Cache-Control": "no-cache"}
+    if if_none_match == tag:
+        return Response(status_code=304, headers=headers)
+
+    cache_key = (version[1], *params)
+    content = _dashboard_cache.get(cache_key)
+    if content is query_cache.MISSING:
+        content = jsonable_encoder(dashboard.build_dashboard(
+            db,
+            _total_thresholds(db),
+            exam_name=exam_name,
+            grade_name=grade_name,
+            class_name=class_name,
+            limit=limit,
+            threshold=threshold,
+        ))
+        _dashboard_cache.set(cache_key, content, version[0])
+    return JSONResponse(content=content, headers=headers)
 
 
 @router.get("/class-comparison", response_model=List[schemas.ClassComparison])
@@ -742,71 +635,7 @@ def get_class_comparison(
     db: Session = Depends(get_db)
 ):
     """班级对比分析"""
-    query = db.query(models.Student)
-    if grade_name:
-        query = query.filter(models.Student.grade_name == grade_name)
-    if exam_name:
-        query = query.filter(models.Student.exam_name == exam_name)
-
-    records = query.all()
-
-    # 获取总分的成绩区间配置
-    total_score_range = _ensure_subject_range(db, "总分")
-    range_config = total_score_range.config
-
-    # 提取各等级的最小分数线
-    pass_min = next((r.get("min", 60) for r in range_config if r.get("key") == "pass"), 60)
-    good_min = next((r.get("min", 80) for r in range_config if r.get("key") == "good"), 80)
-    excellent_min = next((r.get("min", 90) for r in range_config if r.get("key") == "excellent"), 90)
-
-    class_data = {}
-    for record in records:
-        class_name = record.class_name or "未分配班级"
-        if class_name not in class_data:
-            class_data[class_name] = {
-                "records": [],
-                "grade_name": record.grade_name
-            }
-        class_data[class_name]["records"].append(record)
-
-    result = []
-    for class_name, data in class_data.items():
-        class_records = data["records"]
-        total_avg = 0
-        pass_count = 0
-        good_count = 0
-        excellent_count = 0
-        valid_count = 0
-
-        for record in class_records:
-            scores = record.scores or []
-            if scores:
-                total = sum(item.get("score", 0) for item in scores)
-                avg = total / len(scores)
-                total_avg += avg
-                valid_count += 1
-
-                # 使用配置的分数线
-                if avg >= excellent_min:
-                    excellent_count += 1
-                if avg >= good_min:
-                    good_count += 1
-                if avg >= pass_min:
-                    pass_count += 1
-
-        if valid_count > 0:
-            result.append(schemas.ClassComparison(
-                class_name=class_name,
-                grade_name=data["grade_name"],
-                student_count=valid_count,
-                average_score=round(total_avg / valid_count, 2),
-                pass_rate=round(pass_count / valid_count * 100, 2),
-                good_rate=round(good_count / valid_count * 100, 2),
-                excellent_rate=round(excellent_count / valid_count * 100, 2)
-            ))
-
-    result.sort(key=lambda x: x.average_score, reverse=True)
-    return result
+    return grade_stats.build_class_comparison(db, grade_name=grade_name, exam_name=exam_name)
 
 
 @router.get("/class-subject-stats", response_model=schemas.ClassSubjectStats)
@@ -816,44 +645,175 @@ def get_class_subject_stats(
     db: Session = Depends(get_db)
 ):
     """获取班级各科目统计数据（用于计算班级平均分等）"""
-    records = db.query(models.Student).filter(
+    student_filters = (
         models.Student.class_name == class_name,
-        models.Student.exam_name == exam_name
-    ).all()
+        models.Student.exam_name == exam_name,
+    )
+    student_count = db.query(func.count(models.Student.id)).filter(*student_filters).scalar()
 
-    if not records:
+    if not student_count:
         raise HTTPException(status_code=404, detail="未找到该班级的考试记录")
 
-    # 统计各科目的成绩
-    subject_data = {}
-    for record in records:
-        scores = record.scores or []
-        for score_item in scores:
-            subject = score_item.get("subject")
-            score = score_item.get("score", 0)
-            if subject not in subject_data:
-                subject_data[subject] = []
-            subject_data[subject].append(score)
-
-    # 计算各科目的统计信息
-    subject_stats = []
-    for subject, scores in subject_data.items():
-        if scores:
-            subject_stats.append(schemas.SubjectStat(
-                subject=subject,
-                average=round(sum(scores) / len(scores), 2),
-                max_score=round(max(scores), 2),
-                min_score=round(min(scores), 2)
-            ))
+    # 基于 student_scores 表按科目分组统计
+    rows = (
+        db.query(
+            models.StudentScore.subject,
+            func.avg(models.StudentScore.score),
+            func.max(models.StudentScore.score),
+            func.min(models.StudentScore.score),
+        )
+        .join(models.Student, models.Student.id == models.StudentScore.student_id)
+        .filter(*student_filters)
+        .group_by(models.StudentScore.subject)
+        .all()
+    )
+
+    subject_order = {subject: idx for idx, subject in enumerate(DEFAULT_SUBJECTS)}
+    subject_stats = [
+        schemas.SubjectStat(
+            subject=subject,
+            average=round(average, 2),
+            max_score=round(max_score, 2),
+            min_score=round(min_score, 2)
+        )
+        for subject, average, max_score, min_score in sorted(
+            rows, key=lambda row: (subject_order.get(row[0], len(subject_order)), row[0])
+        )
+    ]
 
     return schemas.ClassSubjectStats(
         class_name=class_name,
         exam_name=exam_name,
-        student_count=len(records),
+        student_count=student_count,
         subject_stats=subject_stats
     )
 
 
+@router.get("/distribution", response_model=schemas.ScoreDistribution)
+def get_distribution(
+    exam_name: Optional[str] = Query(None, description="考试名称"),
+    grade_name: Optional[str] = Query(None, description="年级名称"),
+    class_name: Optional[str] = Query(None, description="班级名称"),
+    db: Session = Depends(get_db),
+):
+    """总分及各科成绩在区间配置各分段的人数，供成绩看板直方图使用"""
+    filters = []
+    if exam_name:
+        filters.append(exam_catalog.exam_filter(exam_name))
+    if grade_name:
+        filters.append(models.Student.grade_name == grade_name)
+    if class_name:
+        filters.append(class_catalog.class_filter(class_name))
+    range_configs = {subject: range_config.get_config(db, subject, DEFAULT_RANGE_CONFIG) for subject in ALL_SUBJECTS}
+    return schemas.ScoreDistribution(
+        exam_name=exam_name,
+        grade_name=grade_name,
+        class_name=class_name,
+        subjects=grade_stats.build_distribution(db, filters, range_configs),
+    )
+
+
+@router.get("/exam-analytics", response_model=schemas.ExamAnalytics)
+def get_exam_analytics(
+    exam_name: str = Query(..., description="考试名称"),
+    grade_name: Optional[str] = Query(None, description="年级名称，为空则分析整场考试"),
+    class_name: Optional[str] = Query(None, description="班级名称"),
+    include_students: bool = Query(False, description="是否返回每名学生的总分/均分"),
+    db: Session = Depends(get_db)
+):
+    """整场考试（或考试×年级）的各科均值、标准差、极值、四分位数及分数段分布"""
+    matrix = exam_analytics.load_score_matrix(
+        db, DEFAULT_SUBJECTS, exam_name, grade_name=grade_name, class_name=class_name
+    )
+    if not matrix.student_count:
+        raise HTTPException(status_code=404, detail="未找到该考试的成绩记录")
+    range_configs = {subject: range_config.get_config(db, subject, DEFAULT_RANGE_CONFIG) for subject in ALL_SUBJECTS}
+    return exam_analytics.analyze(
+        matrix, range_configs, exam_name, grade_name=grade_name, include_students=include_students
+    )
+
+
+def _standard_scores(db: Session, exam_name: str, grade_name: Optional[str]) -> exam_analytics.StandardScores:
+    """读取 (考试, 年级) 分区的标准分，未命中缓存时整个分区一次性计算
+
+    grade_name 为空表示整场考试（与 load_score_matrix 一致），空字符串与 None 共用同一缓存项。
+    """
+    grade_name = grade_name or None
+    cache_key = (exam_name, grade_name)
+    cached = _standard_scores_cache.get(cache_key)
+    if cached is query_cache.MISSING:
+        version = query_cache.students_version()
+        matrix = exam_analytics.load_score_matrix(db, DEFAULT_SUBJECTS, exam_name, grade_name=grade_name)
+        cached = exam_analytics.standardize(matrix)
+        _standard_scores_cache.set(cache_key, cached, version)
+    return cached
+
+
+@router.get("/standard-scores", response_model=schemas.StandardScores)
+def get_standard_scores(
+    exam_name: str = Query(..., description="考试名称"),
+    grade_name: Optional[str] = Query(None, description="年级名称，为空则在整场考试内计算"),
+    class_name: Optional[str] = Query(None, description="只返回该班学生，均值与标准差仍按整个年级计算"),
+    db: Session = Depends(get_db),
+):
+    """各科及总分的 Z 分、T 分（50 + 10Z）与百分位排名"""
+    result = _standard_scores(db, exam_name, grade_name)
+    if not len(result.student_nos):
+        raise HTTPException(status_code=404, detail="未找到该考试的成绩记录")
+    return exam_analytics.standard_scores_response(result, exam_name, grade_name=grade_name, class_name=class_name)
+
+
+@router.get("/published-exams", response_model=List[schemas.PublishedExam])
+def list_published_exams(current_user: models.Member = Depends(get_active_member)):
+    """已发布（冻结为快照）的考试列表"""
+    return [_published_exam(snapshot) for snapshot in exam_snapshots.list_published()]
+
+
+@router.post("/published-exams", response_model=schemas.PublishedExam)
+def publish_exam(
+    exam_name: str = Query(..., description="考试名称"),
+    db: Session = Depends(get_db),
+    current_user: models.Member = Depends(get_active_member),
+):
+    """发布考试：将该场考试成绩冻结为快照，家长端查询直接读取快照；修改成绩后需重新发布"""
+    students = (
+        db.query(models.Student)
+        .filter(models.Student.exam_name == exam_name)
+        .order_by(models.Student.created_at.desc(), models.Student.id.desc())
+        .yield_per(_EXPORT_BATCH)
+    )
+    records = [jsonable_encoder(_serialize_student(student)) for student in students]
+    if not records:
+        raise HTTPException(status_code=404, detail="未找到该考试的成绩记录")
+    snapshot = exam_snapshots.publish(exam_name, records)
+    exam_catalog.set_published(db, exam_name, True)
+    db.commit()
+    return _published_exam(snapshot)
+
+
+@router.delete("/published-exams")
+def unpublish_exam(
+    exam_name: str = Query(..., description="考试名称"),
+    db: Session = Depends(get_db),
+    current_user: models.Member = Depends(get_active_member),
+):
+    """取消发布，家长端查询恢复为实时读取数据库"""
+    if not exam_snapshots.unpublish(exam_name):
+        raise HTTPException(status_code=404, detail="该考试未发布")
+    exam_catalog.set_published(db, exam_name, False)
+    db.commit()
+    return {"message": f"已取消发布 {exam_name}"}
+
+
+def _published_exam(snapshot: exam_snapshots.ExamSnapshot) -> schemas.PublishedExam:
+    return schemas.PublishedExam(
+        exam_name=snapshot.exam_name,
+        published_at=snapshot.published_at,
+        student_count=snapshot.student_count,
+        etag=snapshot.etag,
+    )
+
+
 @router.get("/template")
 def download_template():
     wb = Workbook()
@@ -876,6 +836,115 @@ def download_rank_template():
     return _workbook_response(wb, "rank_import_template.xlsx")
 
 
+@router.get("/export")
+def export_students(
+    class_name: Optional[str] = Query(None),
+    exam_name: Optional[str] = Query(None),
+    standard_scores: bool = Query(False, description="附加各科及总分的 T 分与年级内百分位排名"),
+    async_job: bool = Query(False, description="以后台任务生成文件，立即返回任务 ID，完成后从任务下载"),
+    db: Session = Depends(get_db),
+    current_user: Optional[models.Member] = Depends(get_optional_user),
+):
+    if async_job:
+        return _submit_job(
+            "export", _export_job, class_name, exam_name, standard_scores, current_user=current_user
+        )
+    wb, filename = _build_export_workbook(db, class_name, exam_name, standard_scores=standard_scores)
+    return _workbook_response(wb, filename)
+
+
+def _export_job(ctx: jobs.JobContext, db: Session, class_name, exam_name, standard_scores=False):
+    wb, filename = _build_export_workbook(db, class_name, exam_name, ctx, standard_scores=standard_scores)
+    ctx.progress(0.9, "正在保存文件")
+    path = ctx.result_path(".xlsx")
+    wb.save(path)
+    return {
+        "filename": filename,
+        "download_url": f"/api/jobs/{ctx.job_id}/download",
+        "_result_file": str(path),
+    }
+
+
+def _build_export_workbook(
+    db: Session,
+    class_name: Optional[str],
+    exam_name: Optional[str],
+    ctx: Optional[jobs.JobContext] = None,
+    standard_scores: bool = False,
+):
+    """生成成绩导出工作簿，返回 (工作簿, 文件名)
+
+    standard_scores 为真时追加各科及总分的 T 分与百分位列，按每行所属的 (考试, 年级)
+    分区计算；没有考试名称或年级的记录不属于任何年级分区，留空。
+    """
+    query = db.query(
+        models.Student.id,
+        models.Student.name,
+        models.Student.student_no,
+        models.Student.class_name,
+        models.Student.grade_name,
+        models.Student.exam_name,
+        models.Student.exam_date,
+        models.Student.notes,
+        models.Student.scores,
+    )
+    if class_name:
+        query = query.filter(class_catalog.class_filter(class_name))
+    if exam_name:
+        query = query.filter(exam_catalog.exam_filter(exam_name))
+    total_rows = query.count() if ctx else 0
+    # write_only 模式逐行写出，配合 yield_per 分批读取，内存占用与导出行数无关
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    headers = ["姓名", "学号", "班级", "年级", "考试名称", "考试日期", "备注", "总分", "均分"] + DEFAULT_SUBJECTS
+    if standard_scores:
+        for subject in _STANDARD_SCORE_SUBJECTS:
+            headers += [f"{subject}T分", f"{subject}百分位"]
+    ws.append(headers)
+    partitions: Dict[tuple, exam_analytics.StandardScores] = {}
+    for idx, student in enumerate(query.order_by(models.Student.name).yield_per(_EXPORT_BATCH), start=1):
+        if ctx and idx % _EXPORT_BATCH == 0:
+            ctx.progress(0.9 * idx / total_rows, f"已导出 {idx}/{total_rows} 行")
+        score_map = {item.get("subject"): item.get("score") for item in (student.scores or [])}
+        scores = [score_map.get(subject, "") for subject in DEFAULT_SUBJECTS]
+        # 只计算 DEFAULT_SUBJECTS 中有分数的科目
+        score_values = [score_map.get(subject) for subject in DEFAULT_SUBJECTS if score_map.get(subject) is not None and score_map.get(subject) != ""]
+        score_values = [float(s) for s in score_values if isinstance(s, (int, float))]
+        total = sum(score_values)
+        avg = total / len(score_values) if score_values else 0
+        exam_date_str = student.exam_date.strftime("%Y-%m-%d") if student.exam_date else ""
+        ws.append(
+            [
+                student.name,
+                student.student_no,
+                student.class_name,
+                student.grade_name,
+                student.exam_name,
+                exam_date_str,
+                student.notes,
+                round(total, 2),
+                round(avg, 2),
+            ]
+            + scores
+            + (_standard_score_cells(db, partitions, student) if standard_scores else [])
+        )
+    filename = "grade_export.xlsx" if not exam_name else f"grades_{exam_name}.xlsx"
+    return wb, filename
+
+
+def _standard_score_cells(db: Session, partitions: Dict[tuple, exam_analytics.StandardScores], student) -> list:
+    """导出行的 T 分与百分位单元格；partitions 缓存本次导出已读取的分区"""
+    blank = ["", ""] * len(_STANDARD_SCORE_SUBJECTS)
+    if not student.exam_name or not student.grade_name:
+        # 年级为空时 _standard_scores 按整场考试计算，不是该行所属的分区
+        return blank
+    key = (student.exam_name, student.grade_name)
+    result = partitions.get(key)
+    if result is None:
+        result = partitions[key] = _standard_scores(db, student.exam_name, student.grade_name)
+    return result.export_cells(student.id) or blank
+
+
 @router.get("/backup")
 def backup_data(db: Session = Depends(get_db)):
     """备份所有成绩数据"""
@@ -889,9 +958,88 @@ def backup_data(db: Session = Depends(get_db)):
     return data
 
 
+@router.get("/backup/stream")
+def backup_database(
+    tables: Optional[str] = Query(None, description="只备份指定的表，逗号分隔；不传则备份全部"),
+    current_user: models.Member = Depends(get_admin_user),
+):
+    """整库流式备份：gzip 压缩的 NDJSON，包含成绩、积分、会员、会话等全部基础表"""
+    names = [name.strip() for name in tables.split(",") if name.strip()] if tables else None
+    try:
+        table_names = backup.resolve_tables(names)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"不支持的表：{exc}")
+    filename = f"grades_backup_{datetime.now().strftime('%Y%m%d%H%M%S')}.ndjson.gz"
+    return StreamingResponse(
+        backup.iter_backup(table_names),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"},
+    )
+
+
+@router.post("/restore/stream")
+def restore_database(
+    file: UploadFile = File(..., description="backup/stream 导出的 NDJSON 备份，可为 gzip 压缩"),
+    replace: bool = Query(False, description="先清空备份中包含的表再恢复；否则备份记录 id 被现有的其他记录占用时拒绝恢复"),
+    async_job: bool = Query(False, description="以后台任务执行，立即返回任务 ID"),
+    current_user: models.Member = Depends(get_admin_user),
+):
+    """从 NDJSON 备份分块恢复，以 NDJSON 逐行返回各表恢复进度，最后一行为 {"done": true, ...}"""
+    if async_job:
+        path = _spool_upload(file, ".ndjson")
+        return _submit_job("restore", _restore_stream_job, path, replace, current_user=current_user)
+    events = backup.iter_restore(file.file, replace)
+    # 先同步执行到第一条进度，文件格式错误时直接返回 400
+    try:
+        first = next(events)
+    except backup.RestoreError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    def iter_progress():
+        yield json.dumps(first, ensure_ascii=False) + "\n"
+        try:
+            for event in events:
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        except Exception as exc:
+            # 响应已开始发送，只能在流中报告错误；已提交的分块保留
+            yield json.dumps({"error": str(exc)}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(iter_progress(), media_type="application/x-ndjson")
+
+
+def _restore_stream_job(ctx: jobs.JobContext, db: Session, path: str, replace: bool = False):
+    """NDJSON 恢复任务；iter_restore 使用自己的会话分块提交，取消时已提交的分块保留"""
+    try:
+        with open(path, "rb") as fileobj:
+            for event in backup.iter_restore(fileobj, replace):
+                if event.get("done"):
+                    return {"restored": event["restored"]}
+                if event["total"]:
+                    ctx.progress(event["restored"] / event["total"], f"{event['table']}：{event['restored']}/{event['total']}")
+                else:
+                    ctx.check_cancelled()
+    finally:
+        os.unlink(path)
+
+
 @router.post("/restore")
-def restore_data(data: Dict, db: Session = Depends(get_db)):
+def restore_data(
+    data: Dict,
+    async_job: bool = Query(False, description="以后台任务执行，立即返回任务 ID"),
+    db: Session = Depends(get_db),
+    current_user: Optional[models.Member] = Depends(get_optional_user),
+):
     """从备份恢复数据"""
+    if async_job:
+        return _submit_job("restore", _restore_job, data, current_user=current_user)
+    return _restore_backup_data(db, data)
+
+
+def _restore_job(ctx: jobs.JobContext, db: Session, data: Dict):
+    return _restore_backup_data(db, data, ctx)
+
+
+def _restore_backup_data(db: Session, data: Dict, ctx: Optional[jobs.JobContext] = None):
     restored = 0
 
     # 恢复学生数据
@@ -908,14 +1056,18 @@ def restore_data(data: Dict, db: Session = Depends(get_db)):
                 for key, value in student_data.items():
                     if key not in ["id", "created_at", "updated_at"]:
                         setattr(existing, key, value)
+                _apply_scores(existing, existing.scores)
             else:
                 # 创建新记录
                 new_student = models.Student(**{
                     k: v for k, v in student_data.items()
                     if k not in ["id", "created_at", "updated_at"]
                 })
+                _apply_scores(new_student, new_student.scores)
                 db.add(new_student)
             restored += 1
+            if ctx and restored % 500 == 0:
+                ctx.progress(0.9 * restored / len(data["students"]), f"已恢复 {restored} 条")
 
     # 恢复区间设置
     if "ranges" in data:
@@ -929,15 +1081,28 @@ def restore_data(data: Dict, db: Session = Depends(get_db)):
                 record = models.SubjectRange(subject=subject, config=config)
                 db.add(record)
 
+    db.flush()
+    # 区间缓存在提交后才失效，备份中含总分区间时直接使用其分数线
+    total_range = (data.get("ranges") or {}).get("总分")
+    thresholds = rate_thresholds(total_range) if total_range else _total_thresholds(db)
+    grade_stats.rebuild_exam_stats(db, thresholds)
+    exam_catalog.sync_exams(db)
+    class_catalog.sync_classes(db)
     db.commit()
+    if "ranges" in data:
+        range_config.invalidate()
     return {"restored": restored}
 
 
 @router.delete("/clear-all")
 def clear_all_data(db: Session = Depends(get_db)):
     """清空所有成绩数据（危险操作）"""
+    db.query(models.StudentScore).delete()
+    grade_stats.clear_exam_stats(db)
     deleted = db.query(models.Student).delete()
+    db.query(models.Exam).delete()
     db.commit()
+    exam_snapshots.clear()
     return {"deleted": deleted}
 
 
@@ -952,6 +1117,7 @@ def get_student(student_id: int, db: Session = Depends(get_db)):
 @router.post("/", response_model=schemas.Student, status_code=201)
 def create_student(
     payload: schemas.StudentCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: models.Member = Depends(get_active_member),
 ):
@@ -973,12 +1139,16 @@ def create_student(
         exam_name=payload.exam_name,
         gender=payload.gender,
         notes=payload.notes,
-        scores=[score.model_dump() for score in payload.scores],
         class_rank=payload.class_rank,
         grade_rank=payload.grade_rank,
     )
+    _apply_scores(student, [score.model_dump() for score in payload.scores])
     db.add(student)
+    stats_keys = [grade_stats.exam_stats_key(student)]
+    _refresh_exam_stats(db, stats_keys)
     db.commit()
+    # 分区内其他学生的排名总是重算，手动指定的排名在重算后写回
+    _schedule_rank_refresh(background_tasks, stats_keys, _manual_ranks(student.id, payload))
     db.refresh(student)
     return _serialize_student(student)
 
@@ -987,6 +1157,7 @@ def create_student(
 def update_student(
     student_id: int,
     payload: schemas.StudentUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: models.Member = Depends(get_active_member),
 ):
@@ -1007,6 +1178,7 @@ def update_student(
         )
         if exists:
             raise HTTPException(status_code=400, detail="同一考试中该学号已存在")
+    old_stats_key = grade_stats.exam_stats_key(student)
     if payload.student_no is not None:
         student.student_no = payload.student_no
     for field in ["name", "class_name", "grade_name", "exam_name", "gender", "notes"]:
@@ -1014,13 +1186,17 @@ def update_student(
         if value is not None:
             setattr(student, field, value)
     if payload.scores is not None:
-        student.scores = [score.model_dump() for score in payload.scores]
+        _apply_scores(student, [score.model_dump() for score in payload.scores])
     if payload.class_rank is not None:
         student.class_rank = payload.class_rank
     if payload.grade_rank is not None:
         student.grade_rank = payload.grade_rank
     db.add(student)
+    stats_keys = [old_stats_key, grade_stats.exam_stats_key(student)]
+    _refresh_exam_stats(db, stats_keys)
     db.commit()
+    # 分区内其他学生的排名总是重算，手动指定的排名在重算后写回
+    _schedule_rank_refresh(background_tasks, stats_keys, _manual_ranks(student.id, payload))
     db.refresh(student)
     return _serialize_student(student)
 
@@ -1028,55 +1204,162 @@ def update_student(
 @router.delete("/{student_id}", status_code=204)
 def delete_student(
     student_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: models.Member = Depends(get_active_member),
 ):
     student = db.get(models.Student, student_id)
     if not student:
         raise HTTPException(status_code=404, detail="学生不存在")
+    stats_key = grade_stats.exam_stats_key(student)
     db.delete(student)
+    _refresh_exam_stats(db, [stats_key])
     db.commit()
+    _schedule_rank_refresh(background_tasks, [stats_key])
     return None
 
 
+def _submit_job(kind: str, func, *args: Any, current_user: Optional[models.Member]) -> JSONResponse:
+    """提交后台任务，返回 202 和任务 ID，客户端轮询 /api/jobs/{id} 获取进度"""
+    if current_user is None:
+        raise HTTPException(status_code=401, detail="后台任务需要登录后提交")
+    job = jobs.submit(kind, func, *args, member_id=current_user.id)
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job.id, "status": job.status, "status_url": f"/api/jobs/{job.id}"},
+    )
+
+
+def _spool_upload(file: UploadFile, suffix: str) -> str:
+    """请求结束后上传的临时文件会被关闭，后台任务需要先把内容复制到独立的临时文件"""
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as spool:
+        shutil.copyfileobj(file.file, spool, _STREAM_CHUNK_SIZE)
+    return spool.name
+
+
 def _workbook_response(wb: Workbook, filename: str) -> StreamingResponse:
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
+    """将工作簿保存到临时文件后分块流式返回，避免在内存中再复制一份完整文件"""
+    spool = tempfile.TemporaryFile()
+    try:
+        wb.save(spool)
+        size = spool.tell()
+        spool.seek(0)
+    except Exception:
+        spool.close()
+        raise
+
+    def iter_file():
+        with spool:
+            while True:
+                chunk = spool.read(_STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
     return StreamingResponse(
-        buffer,
+        iter_file(),
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        headers={
+            # 文件名可能含中文，按 RFC 5987 编码，避免响应头 latin-1 编码失败
+            "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}",
+            "Content-Length": str(size),
+        },
     )
 
 
 @router.post("/import")
-async def import_students(
+def import_students(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     class_name: Optional[str] = Form(None),
     grade_name: Optional[str] = Form(None),
     exam_name: Optional[str] = Form(None),
+    async_job: bool = Query(False, description="以后台任务执行，立即返回任务 ID"),
     db: Session = Depends(get_db),
     current_user: models.Member = Depends(get_active_member),
 ):
-    contents = await file.read()
+    if async_job:
+        path = _spool_upload(file, ".xlsx")
+        return _submit_job("import", _import_job, path, class_name, grade_name, exam_name, current_user=current_user)
+    result, stats_keys = _import_workbook(db, file.file, class_name, grade_name, exam_name)
+    _schedule_rank_refresh(background_tasks, stats_keys)
+    return result
+
+
+def _import_job(ctx: jobs.JobContext, db: Session, path: str, class_name, grade_name, exam_name):
+    try:
+        with open(path, "rb") as fileobj:
+            result, stats_keys = _import_workbook(db, fileobj, class_name, grade_name, exam_name, ctx)
+    finally:
+        os.unlink(path)
+    ctx.progress(0.9, "正在计算排名")
+    ranking.recompute_partitions(ranking.dirty_partitions(stats_keys))
+    return result
+
+
+def _import_workbook(
+    db: Session,
+    fileobj: Any,
+    class_name: Optional[str],
+    grade_name: Optional[str],
+    exam_name: Optional[str],
+    ctx: Optional[jobs.JobContext] = None,
+):
+    """解析成绩表并批量写入，返回 (导入结果, 受影响的 exam_stats 键)"""
+    # 上传文件由 Starlette 缓存在 SpooledTemporaryFile 中（超过 1MB 落盘），
+    # 以只读模式逐行流式解析，不把整个文件和工作簿读入内存
     try:
-        wb = load_workbook(BytesIO(contents))
+        wb = load_workbook(fileobj, read_only=True, data_only=True)
     except Exception as exc:  # pragma: no cover - openpyxl internal
         raise HTTPException(status_code=400, detail="无法读取 Excel 文件") from exc
 
-    ws = wb.active
-    header_row = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), None)
-    if not header_row:
-        raise HTTPException(status_code=400, detail="表格为空")
-    header_map: Dict[str, int] = {str(value).strip(): idx for idx, value in enumerate(header_row) if value}
-    for required in ["姓名", "学号"]:
-        if required not in header_map:
-            raise HTTPException(status_code=400, detail=f"缺少必要列：{required}")
+    try:
+        ws = wb.active
+        header_row = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), None)
+        if not header_row:
+            raise HTTPException(status_code=400, detail="表格为空")
+        header_map: Dict[str, int] = {str(value).strip(): idx for idx, value in enumerate(header_row) if value}
+        for required in ["姓名", "学号"]:
+            if required not in header_map:
+                raise HTTPException(status_code=400, detail=f"缺少必要列：{required}")
+
+        records, errors = _parse_import_rows(ws, header_map, class_name, grade_name, exam_name)
+    finally:
+        wb.close()
+
+    if ctx:
+        ctx.progress(0.5, "正在写入数据库")
+    try:
+        imported, updated, stats_keys = bulk_import.upsert_students(db, records)
+        _refresh_exam_stats(db, stats_keys)
+        if ctx:
+            ctx.check_cancelled()
+        db.commit()
+    except jobs.JobCancelled:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"数据库保存失败: {str(e)}")
 
-    imported = 0
-    updated = 0
-    errors = []
+    result = {"imported": imported, "updated": updated}
+    if errors:
+        result["errors"] = errors[:10]  # 只返回前10个错误
+        result["total_errors"] = len(errors)
+
+    return result, stats_keys
+
+
+def _parse_import_rows(
+    ws: Any,
+    header_map: Dict[str, int],
+    class_name: Optional[str],
+    grade_name: Optional[str],
+    exam_name: Optional[str],
+):
+    """逐行解析导入表格，返回 (学生记录列表, 错误信息列表)"""
+    records: List[Dict[str, Any]] = []
+    errors: List[str] = []
 
     for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
         if row is None:
@@ -1093,9 +1376,10 @@ async def import_students(
             else:
                 student_no = str(student_no_raw).strip()
             name = str(name).strip()
-            row_class = _get_cell_value(row, header_map, "班级") or class_name
-            row_grade = _get_cell_value(row, header_map, "年级") or grade_name
-            row_exam = _get_cell_value(row, header_map, "考试名称") or exam_name
+            # 数字或日期格式的单元格（如考试名称 2024）统一转为文本，与入库后的值及合并键一致
+            row_class = _cell_text(_get_cell_value(row, header_map, "班级")) or class_name
+            row_grade = _cell_text(_get_cell_value(row, header_map, "年级")) or grade_name
+            row_exam = _cell_text(_get_cell_value(row, header_map, "考试名称")) or exam_name
             row_exam_date_raw = _get_cell_value(row, header_map, "考试日期")
             row_exam_date = None
             if row_exam_date_raw:
@@ -1135,64 +1419,48 @@ async def import_students(
             if invalid_scores:
                 errors.append(f"第{row_num}行({name})存在无效分数: {', '.join(invalid_scores)}")
 
-            existing = (
-                db.query(models.Student)
-                    .filter(
-                        models.Student.student_no == student_no,
-                        models.Student.exam_name == row_exam,
-                    )
-                    .first()
-            )
-            if existing:
-                existing.name = name
-                existing.class_name = row_class
-                existing.grade_name = row_grade
-                existing.exam_name = row_exam
-                existing.exam_date = row_exam_date
-                existing.notes = row_notes
-                existing.scores = scores
-                db.add(existing)
-                updated += 1
-            else:
-                student = models.Student(
-                    name=name,
-                    student_no=student_no,
-                    class_name=row_class,
-                    grade_name=row_grade,
-                    exam_name=row_exam,
-                    exam_date=row_exam_date,
-                    notes=row_notes,
-                    scores=scores,
-                )
-                db.add(student)
-                imported += 1
+            records.append({
+                "name": name,
+                "student_no": student_no,
+                "class_name": row_class,
+                "grade_name": row_grade,
+                "exam_name": row_exam,
+                "exam_date": row_exam_date,
+                "notes": row_notes,
+                "scores": scores,
+            })
         except Exception as e:
             errors.append(f"第{row_num}行处理失败: {str(e)}")
             continue
 
-    try:
-        db.commit()
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"数据库保存失败: {str(e)}")
-
-    result = {"imported": imported, "updated": updated}
-    if errors:
-        result["errors"] = errors[:10]  # 只返回前10个错误
-        result["total_errors"] = len(errors)
-
-    return result
+    return records, errors
 
 
 @router.post("/import-ranks")
-async def import_ranks(
+def import_ranks(
     file: UploadFile = File(...),
+    async_job: bool = Query(False, description="以后台任务执行，立即返回任务 ID"),
     db: Session = Depends(get_db),
+    current_user: Optional[models.Member] = Depends(get_optional_user),
 ):
     """导入年级排名和班级排名数据"""
-    contents = await file.read()
+    if async_job:
+        path = _spool_upload(file, ".xlsx")
+        return _submit_job("import-ranks", _import_ranks_job, path, current_user=current_user)
+    return _import_rank_workbook(db, file.file)
+
+
+def _import_ranks_job(ctx: jobs.JobContext, db: Session, path: str):
     try:
-        wb = load_workbook(BytesIO(contents))
+        with open(path, "rb") as fileobj:
+            return _import_rank_workbook(db, fileobj, ctx)
+    finally:
+        os.unlink(path)
+
+
+def _import_rank_workbook(db: Session, fileobj: Any, ctx: Optional[jobs.JobContext] = None):
+    try:
+        wb = load_workbook(fileobj, read_only=True, data_only=True)
     except Exception as exc:
         raise HTTPException(status_code=400, detail="无法读取 Excel 文件") from exc
 
@@ -1261,7 +1529,10 @@ async def import_ranks(
         else:
             not_found += 1
             errors.append(f"第{row_idx}行：未找到学号 {student_no} 在考试 {exam_name} 的记录")
+    wb.close()
 
+    if ctx:
+        ctx.check_cancelled()
     db.commit()
 
     return {
@@ -1271,49 +1542,6 @@ async def import_ranks(
     }
 
 
-@router.get("/export")
-def export_students(
-    class_name: Optional[str] = Query(None),
-    exam_name: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
-):
-    query = db.query(models.Student)
-    if class_name:
-        query = query.filter(models.Student.class_name == class_name)
-    if exam_name:
-        query = query.filter(models.Student.exam_name == exam_name)
-    students = query.order_by(models.Student.name).all()
-    wb = Workbook()
-    ws = wb.active
-    headers = ["姓名", "学号", "班级", "年级", "考试名称", "考试日期", "备注", "总分", "均分"] + DEFAULT_SUBJECTS
-    ws.append(headers)
-    for student in students:
-        score_map = {item.get("subject"): item.get("score") for item in (student.scores or [])}
-        scores = [score_map.get(subject, "") for subject in DEFAULT_SUBJECTS]
-        # 只计算 DEFAULT_SUBJECTS 中有分数的科目
-        score_values = [score_map.get(subject) for subject in DEFAULT_SUBJECTS if score_map.get(subject) is not None and score_map.get(subject) != ""]
-        score_values = [float(s) for s in score_values if isinstance(s, (int, float))]
-        total = sum(score_values)
-        avg = total / len(score_values) if score_values else 0
-        exam_date_str = student.exam_date.strftime("%Y-%m-%d") if student.exam_date else ""
-        ws.append(
-            [
-                student.name,
-                student.student_no,
-                student.class_name,
-                student.grade_name,
-                student.exam_name,
-                exam_date_str,
-                student.notes,
-                round(total, 2),
-                round(avg, 2),
-            ]
-            + scores
-        )
-    filename = "grade_export.xlsx" if not exam_name else f"grades_{exam_name}.xlsx"
-    return _workbook_response(wb, filename)
-
-
 def _get_cell_value(row: Any, header_map: Dict[str, int], title: str):
     idx = header_map.get(title)
     if idx is None:
@@ -1321,6 +1549,49 @@ def _get_cell_value(row: Any, header_map: Dict[str, int], title: str):
     return row[idx]
 
 
+def _cell_text(value: Any) -> Any:
+    """非文本单元格转为 SQLite 文本列中保存的形式；空值原样返回"""
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+
+def _schedule_rank_refresh(background_tasks: Optional[BackgroundTasks], keys, overrides=None) -> None:
+    """提交后在后台只重算本次写入涉及的 (考试, 年级) 分区排名"""
+    partitions = ranking.dirty_partitions(keys)
+    if background_tasks is not None and partitions:
+        background_tasks.add_task(ranking.recompute_partitions, partitions, overrides)
+
+
+def _manual_ranks(student_id: int, payload) -> Optional[Dict[int, Dict[str, int]]]:
+    """请求中手动指定的排名，供重算分区排名后写回"""
+    values = {
+        field: getattr(payload, field)
+        for field in ("class_rank", "grade_rank")
+        if getattr(payload, field) is not None
+    }
+    return {student_id: values} if values else None
+
+
+def _refresh_exam_stats(db: Session, keys) -> None:
+    """flush 学生记录改动后，在同一事务中刷新受影响的 exam_stats 行与考试、班级维度"""
+    db.flush()
+    keys = list(keys)
+    grade_stats.refresh_exam_stats(db, keys, _total_thresholds(db))
+    exam_catalog.sync_exams(db, (key[0] for key in keys))
+    class_catalog.sync_classes(db, (key[2] for key in keys))
+
+
+def _total_thresholds(db: Session):
+    """总分区间配置中的 (及格线, 良好线, 优秀线)"""
+    return _subject_thresholds(db, "总分")
+
+
+def _subject_thresholds(db: Session, subject: str):
+    """指定科目区间配置中的 (及格线, 良好线, 优秀线)，未配置时使用默认区间"""
+    return range_config.thresholds(db, subject, DEFAULT_RANGE_CONFIG)
+
+
 def _ensure_subject_range(db: Session, subject: str) -> models.SubjectRange:
     record = db.query(models.SubjectRange).filter(models.SubjectRange.subject == subject).first()
     if not record:
@@ -1331,88 +1602,21 @@ def _ensure_subject_range(db: Session, subject: str) -> models.SubjectRange:
     return record
 
 
-@router.get("/ranges", response_model=Dict[str, List[schemas.RangeSegment]])
-def get_all_ranges(db: Session = Depends(get_db)):
-    configs: Dict[str, List[schemas.RangeSegment]] = {}
-    for subject in ALL_SUBJECTS:
-        record = _ensure_subject_range(db, subject)
-        configs[subject] = [schemas.RangeSegment(**segment) for segment in record.config]
-    return configs
-
-
-@router.put("/ranges/{subject}", response_model=List[schemas.RangeSegment])
-def update_range(subject: str, payload: List[schemas.RangeSegment], db: Session = Depends(get_db)):
-    if subject not in ALL_SUBJECTS:
-        raise HTTPException(status_code=400, detail="科目不在允许范围内")
-    if not payload:
-        raise HTTPException(status_code=400, detail="请选择至少一个区间")
-    validated = []
-    for segment in payload:
-        if segment.max is not None and segment.max <= segment.min:
-            raise HTTPException(status_code=400, detail=f"{segment.name} 的最大值需大于最小值")
-        validated.append(segment.model_dump())
-    record = _ensure_subject_range(db, subject)
-    record.config = validated
-    db.add(record)
-    db.commit()
-    db.refresh(record)
-    return [schemas.RangeSegment(**segment) for segment in record.config]
-
-
 @router.post("/calculate-ranks")
-def calculate_ranks(db: Session = Depends(get_db)):
-    """自动计算所有考试的年级排名和班级排名"""
-    # 获取所有考试名称和年级
-    exam_grades = db.query(
-        models.Student.exam_name,
-        models.Student.grade_name
-    ).distinct().all()
-
-    updated = 0
-
-    for exam_name, grade_name in exam_grades:
-        if not exam_name or not grade_name:
-            continue
-
-        # 获取该年级该考试的所有学生
-        students = db.query(models.Student).filter(
-            models.Student.exam_name == exam_name,
-            models.Student.grade_name == grade_name
-        ).all()
-
-        # 计算每个学生的总分并排序
-        student_scores = []
-        for student in students:
-            scores = student.scores or []
-            total_score = sum(item.get("score", 0) for item in scores) if scores else 0
-            student_scores.append((student, total_score))
-
-        # 按总分降序排列
-        student_scores.sort(key=lambda x: x[1], reverse=True)
-
-        # 计算年级排名
-        for rank, (student, total_score) in enumerate(student_scores, 1):
-            if total_score > 0:  # 只为有成绩的学生设置排名
-                student.grade_rank = rank
-                updated += 1
-
-        # 按班级分组计算班级排名
-        class_students = {}
-        for student, total_score in student_scores:
-            if student.class_name:
-                if student.class_name not in class_students:
-                    class_students[student.class_name] = []
-                class_students[student.class_name].append((student, total_score))
-
-        # 为每个班级计算排名
-        for class_name, class_student_list in class_students.items():
-            # 按总分降序排列
-            class_student_list.sort(key=lambda x: x[1], reverse=True)
-            for rank, (student, total_score) in enumerate(class_student_list, 1):
-                if total_score > 0:  # 只为有成绩的学生设置排名
-                    student.class_rank = rank
-
+def calculate_ranks(
+    exam_name: Optional[str] = Query(None, description="只计算指定考试，为空则计算所有考试"),
+    grade_name: Optional[str] = Query(None, description="只计算指定年级"),
+    async_job: bool = Query(False, description="以后台任务执行，立即返回任务 ID"),
+    db: Session = Depends(get_db),
+    current_user: Optional[models.Member] = Depends(get_optional_user),
+):
+    """自动计算考试的年级排名和班级排名（同分并列）"""
+    if async_job:
+        return _submit_job("calculate-ranks", _calculate_ranks_job, exam_name, grade_name, current_user=current_user)
+    updated = ranking.recompute_ranks(db, exam_name=exam_name, grade_name=grade_name)
     db.commit()
     return {"updated": updated}
 
 
+def _calculate_ranks_job(ctx: jobs.JobContext, db: Session, exam_name, grade_name):
+    return {"updated": ranking.recompute_ranks(db, exam_name=exam_name, grade_name=grade_name)}
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -245,17 +245,27 @@ class CriticalStudent(BaseModel):
     name: str
     class_name: Optional[str]
     exam_name: Optional[str]
+    subject: str = "总分"
+    score: float
     average_score: float
     distance_to_line: float
     category: str
 
 
 class CriticalStudents(BaseModel):
+    subject: str = "总分"
+    lines: Dict[str, float]
     near_pass: List[CriticalStudent]
     near_good: List[CriticalStudent]
     near_excellent: List[CriticalStudent]
 
 
+class FilterOptions(BaseModel):
+    exams: List[str]
+    grades: List[str]
+    classes: List[str]
+
+
 class ClassComparison(BaseModel):
     class_name: str
     grade_name: Optional[str]
@@ -266,6 +276,18 @@ class ClassComparison(BaseModel):
     excellent_rate: float
 
 
+class Dashboard(BaseModel):
+    """成绩分析看板的合并数据"""
+    exam_name: Optional[str] = None
+    grade_name: Optional[str] = None
+    class_name: Optional[str] = None
+    summary: StudentSummary
+    class_stats: List[ClassStats]
+    class_comparison: List[ClassComparison]
+    progress: ProgressAnalysis
+    critical_students: CriticalStudents
+
+
 class SubjectStat(BaseModel):
     subject: str
     average: float
@@ -280,6 +302,113 @@ class ClassSubjectStats(BaseModel):
     subject_stats: List[SubjectStat]
 
 
+class RangeBucket(RangeSegment):
+    count: int
+
+
+class SubjectDistribution(BaseModel):
+    subject: str
+    count: int  # 有成绩的人数（含不在任何区间内的）
+    buckets: List[RangeBucket]
+
+
+class ScoreDistribution(BaseModel):
+    exam_name: Optional[str] = None
+    grade_name: Optional[str] = None
+    class_name: Optional[str] = None
+    subjects: List[SubjectDistribution]
+
+
+class SubjectAnalytics(BaseModel):
+    subject: str
+    count: int
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    q1: Optional[float] = None
+    median: Optional[float] = None
+    q3: Optional[float] = None
+    distribution: List[RangeBucket] = []
+
+
+class StudentAnalytics(BaseModel):
+    student_no: str
+    name: str
+    class_name: Optional[str]
+    subject_count: int
+    total_score: Optional[float]
+    average_score: Optional[float]
+
+
+class StandardScore(BaseModel):
+    score: Optional[float] = None
+    z: Optional[float] = None
+    t: Optional[float] = None
+    percentile: Optional[float] = None
+
+
+class StudentStandardScores(BaseModel):
+    student_no: str
+    name: str
+    class_name: Optional[str]
+    scores: Dict[str, StandardScore]
+
+
+class SubjectMoments(BaseModel):
+    subject: str
+    count: int
+    mean: Optional[float] = None
+    std: Optional[float] = None
+
+
+class StandardScores(BaseModel):
+    exam_name: str
+    grade_name: Optional[str]
+    student_count: int
+    subjects: List[SubjectMoments]
+    students: List[StudentStandardScores] = []
+
+
+class ExamAnalytics(BaseModel):
+    exam_name: str
+    grade_name: Optional[str]
+    student_count: int
+    subjects: List[SubjectAnalytics]
+    total: SubjectAnalytics
+    average: SubjectAnalytics
+    students: List[StudentAnalytics] = []
+
+
+class Exam(ORMModel):
+    id: int
+    name: str
+    exam_date: Optional[datetime] = None
+    grade_name: Optional[str] = None
+    subjects: List[str] = []
+    is_published: bool = False
+
+
+class PublishedExam(BaseModel):
+    exam_name: str
+    published_at: datetime
+    student_count: int
+    etag: str
+
+
+class Job(ORMModel):
+    id: str
+    kind: str
+    status: str
+    progress: float
+    message: Optional[str] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
 # ============ 用户认证系统 Schemas ============
 
 class UserBase(ORMModel):
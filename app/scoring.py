@@ -0,0 +1,35 @@
+"""
+成绩汇总工具
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def summarize_scores(scores: Optional[Iterable[Dict[str, Any]]]) -> Tuple[float, float, int]:
+    """根据 scores 列表计算 (总分, 均分, 科目数)"""
+    items = list(scores or [])
+    total = float(sum(item.get("score", 0) or 0 for item in items))
+    count = len(items)
+    average = total / count if count else 0.0
+    return total, average, count
+
+
+def explode_scores(scores: Optional[Iterable[Dict[str, Any]]]) -> List[Tuple[str, float]]:
+    """将 scores 列表拆分为 (科目, 分数) 行，用于写入 student_scores 表"""
+    rows = []
+    for item in scores or []:
+        subject = item.get("subject")
+        if not subject:
+            continue
+        rows.append((subject, float(item.get("score", 0) or 0)))
+    return rows
+
+
+def rate_thresholds(range_config: Optional[Iterable[Dict[str, Any]]]) -> Tuple[float, float, float]:
+    """从区间配置中提取 (及格线, 良好线, 优秀线)"""
+    config = list(range_config or [])
+    pass_min = next((r.get("min", 60) for r in config if r.get("key") == "pass"), 60)
+    good_min = next((r.get("min", 80) for r in config if r.get("key") == "good"), 80)
+    excellent_min = next((r.get("min", 90) for r in config if r.get("key") == "excellent"), 90)
+    return pass_min, good_min, excellent_min
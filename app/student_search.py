@@ -0,0 +1,107 @@
+"""
+学生姓名/学号关键字检索
+
+SQLite 下维护 FTS5 trigram 影子索引 students_fts（外部内容表，由触发器与 students 同步），
+关键字子串匹配走倒排索引；关键字不足 3 个字符或非 SQLite 数据库时回退为 ILIKE 扫描。
+"""
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from sqlalchemy import column, or_, select, table, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from . import models
+
+FTS_TABLE = "students_fts"
+
+# trigram 分词器只能为不少于 3 个字符的关键字建立检索条件
+_MIN_TRIGRAM_LENGTH = 3
+
+_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, student_no, content='students', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS students_fts_ai AFTER INSERT ON students BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, student_no) VALUES (new.id, new.name, new.student_no);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS students_fts_ad AFTER DELETE ON students BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, student_no)
+        VALUES ('delete', old.id, old.name, old.student_no);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS students_fts_au AFTER UPDATE OF name, student_no ON students BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, student_no)
+        VALUES ('delete', old.id, old.name, old.student_no);
+        INSERT INTO {FTS_TABLE}(rowid, name, student_no) VALUES (new.id, new.name, new.student_no);
+    END
+    """,
+]
+
+_fts_table = table(FTS_TABLE, column("rowid"))
+
+# 按数据库 URL 缓存索引是否可用，避免每次查询都检查 sqlite_master
+_available: Dict[str, bool] = {}
+
+
+def _has_fts_table(conn: Connection) -> bool:
+    return conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": FTS_TABLE},
+    ).first() is not None
+
+
+def ensure_search_index(engine: Engine) -> bool:
+    """创建 FTS5 索引及同步触发器（首次创建时从 students 全量构建），返回索引是否可用"""
+    if engine.dialect.name != "sqlite":
+        _available[str(engine.url)] = False
+        return False
+    try:
+        with engine.begin() as conn:
+            existed = _has_fts_table(conn)
+            for statement in _DDL:
+                conn.execute(text(statement))
+            if not existed:
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    except Exception:
+        # SQLite 未编译 FTS5 或版本低于 3.34（不支持 trigram）时退回 ILIKE
+        _available[str(engine.url)] = False
+        return False
+    _available[str(engine.url)] = True
+    return True
+
+
+def _index_available(db: Session) -> bool:
+    bind = db.get_bind()
+    key = str(bind.engine.url)
+    if key not in _available:
+        if bind.dialect.name != "sqlite":
+            _available[key] = False
+        else:
+            with bind.engine.connect() as conn:
+                _available[key] = _has_fts_table(conn)
+    return _available[key]
+
+
+def _match_query(keyword: str) -> str:
+    # 作为短语整体匹配，避免关键字中的 FTS5 语法字符被解析
+    return '"' + keyword.replace('"', '""') + '"'
+
+
+def keyword_filter(db: Session, keyword: str) -> Any:
+    """姓名或学号包含 keyword 的过滤条件（不区分大小写）"""
+    if len(keyword) >= _MIN_TRIGRAM_LENGTH and _index_available(db):
+        match = text(f"{FTS_TABLE} MATCH :fts_keyword").bindparams(fts_keyword=_match_query(keyword))
+        return models.Student.id.in_(select(_fts_table.c.rowid).where(match))
+    like = f"%{keyword}%"
+    return or_(
+        models.Student.name.ilike(like),
+        models.Student.student_no.ilike(like),
+    )
@@ -26,6 +26,13 @@ echo ""
 echo "步骤 2/4: 运行数据库迁移..."
 echo "----------------------------------------"
 python migrate_sessions_table.py
+python migrate_add_score_summary.py
+python migrate_add_student_scores.py
+python migrate_add_exam_stats.py
+python migrate_add_student_list_index.py
+python migrate_add_student_trend_index.py
+python migrate_add_exams.py
+python migrate_add_student_class_id.py
 
 echo ""
 echo "步骤 3/4: 初始化管理员账号..."
@@ -0,0 +1,38 @@
+"""
+数据库迁移脚本 - 创建 exam_stats 考试统计表及 students 相关索引，并按当前总分分数线构建统计
+"""
+from sqlalchemy import text
+from app.database import SessionLocal, engine
+from app.grade_stats import rebuild_exam_stats
+from app.models import ExamStat, SubjectRange
+from app.scoring import rate_thresholds
+
+
+def migrate():
+    print("开始数据库迁移...")
+
+    ExamStat.__table__.create(bind=engine, checkfirst=True)
+    print("✓ exam_stats 表已就绪")
+
+    with engine.connect() as conn:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_students_exam_grade_class "
+            "ON students (exam_name, grade_name, class_name)"
+        ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_students_class_student_gender "
+            "ON students (class_name, student_no, gender)"
+        ))
+        conn.commit()
+    print("✓ students 统计索引已就绪")
+
+    with SessionLocal() as db:
+        total_range = db.query(SubjectRange).filter(SubjectRange.subject == "总分").first()
+        rebuild_exam_stats(db, rate_thresholds(total_range.config if total_range else None))
+        db.commit()
+        print(f"✓ 已构建 {db.query(ExamStat).count()} 条考试统计")
+
+    print("数据库迁移完成！")
+
+if __name__ == "__main__":
+    migrate()
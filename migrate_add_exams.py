@@ -0,0 +1,35 @@
+"""
+数据库迁移脚本 - 创建 exams 考试维度表，为 students 表添加 exam_id 字段，并从已有成绩记录构建考试维度
+"""
+from sqlalchemy import text
+from app.database import SessionLocal, engine
+from app.exam_catalog import sync_exams
+from app.models import Exam
+
+
+def migrate():
+    print("开始数据库迁移...")
+
+    Exam.__table__.create(bind=engine, checkfirst=True)
+    print("✓ exams 表已就绪")
+
+    with engine.connect() as conn:
+        columns = [row[1] for row in conn.execute(text("PRAGMA table_info(students)")).fetchall()]
+        if 'exam_id' in columns:
+            print("✓ exam_id 字段已存在，跳过添加")
+        else:
+            print("添加 exam_id 字段到 students 表...")
+            conn.execute(text("ALTER TABLE students ADD COLUMN exam_id INTEGER REFERENCES exams (id)"))
+            print("✓ exam_id 字段添加成功")
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_students_exam_id ON students (exam_id)"))
+        conn.commit()
+
+    with SessionLocal() as db:
+        sync_exams(db)
+        db.commit()
+        print(f"✓ 已登记 {db.query(Exam).count()} 场考试")
+
+    print("数据库迁移完成！")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,64 @@
+"""
+数据库迁移脚本 - 为 students 表添加 total_score / average_score / score_count 字段并回填
+"""
+import json
+
+from sqlalchemy import create_engine, text
+from app.database import DATABASE_URL
+from app.scoring import summarize_scores
+
+NEW_COLUMNS = {
+    "total_score": "FLOAT NOT NULL DEFAULT 0",
+    "average_score": "FLOAT NOT NULL DEFAULT 0",
+    "score_count": "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+def migrate():
+    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+
+    print("开始数据库迁移...")
+
+    with engine.connect() as conn:
+        # 检查字段是否已存在
+        result = conn.execute(text(
+            "PRAGMA table_info(students)"
+        ))
+
+        columns = [row[1] for row in result.fetchall()]
+
+        for column, ddl in NEW_COLUMNS.items():
+            if column in columns:
+                print(f"✓ {column} 字段已存在，跳过添加")
+            else:
+                print(f"添加 {column} 字段到 students 表...")
+                conn.execute(text(f"ALTER TABLE students ADD COLUMN {column} {ddl}"))
+                print(f"✓ {column} 字段添加成功")
+
+        for column in NEW_COLUMNS:
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_students_{column} ON students ({column})"
+            ))
+
+        print("回填已有记录的总分/均分/科目数...")
+        rows = conn.execute(text("SELECT id, scores FROM students")).fetchall()
+        params = []
+        for student_id, raw_scores in rows:
+            scores = json.loads(raw_scores) if isinstance(raw_scores, str) else raw_scores
+            total, average, count = summarize_scores(scores)
+            params.append({"id": student_id, "total": total, "average": average, "count": count})
+        if params:
+            conn.execute(
+                text(
+                    "UPDATE students SET total_score = :total, average_score = :average, "
+                    "score_count = :count WHERE id = :id"
+                ),
+                params,
+            )
+        conn.commit()
+        print(f"✓ 已回填 {len(params)} 条记录")
+
+    print("数据库迁移完成！")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,35 @@
+"""
+数据库迁移脚本 - 为 students 表添加 class_id 字段（指向成绩与积分系统共用的 points_classes 班级表），并登记已有班级
+"""
+from sqlalchemy import text
+from app.class_catalog import sync_classes
+from app.database import SessionLocal, engine
+from app.models import PointsClass
+
+
+def migrate():
+    print("开始数据库迁移...")
+
+    PointsClass.__table__.create(bind=engine, checkfirst=True)
+    print("✓ points_classes 班级表已就绪")
+
+    with engine.connect() as conn:
+        columns = [row[1] for row in conn.execute(text("PRAGMA table_info(students)")).fetchall()]
+        if 'class_id' in columns:
+            print("✓ class_id 字段已存在，跳过添加")
+        else:
+            print("添加 class_id 字段到 students 表...")
+            conn.execute(text("ALTER TABLE students ADD COLUMN class_id INTEGER REFERENCES points_classes (id)"))
+            print("✓ class_id 字段添加成功")
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_students_class_id ON students (class_id)"))
+        conn.commit()
+
+    with SessionLocal() as db:
+        sync_classes(db)
+        db.commit()
+        print(f"✓ 班级表共 {db.query(PointsClass).count()} 个班级")
+
+    print("数据库迁移完成！")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,22 @@
+"""
+数据库迁移脚本 - 为 students 表添加 (updated_at, id) 复合索引，支持学生列表键集分页
+"""
+from sqlalchemy import text
+from app.database import engine
+
+
+def migrate():
+    print("开始数据库迁移...")
+
+    with engine.connect() as conn:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_students_updated_at_id "
+            "ON students (updated_at, id)"
+        ))
+        conn.commit()
+    print("✓ students 分页索引已就绪")
+
+    print("数据库迁移完成！")
+
+if __name__ == "__main__":
+    migrate()
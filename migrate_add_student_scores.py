@@ -0,0 +1,44 @@
+"""
+数据库迁移脚本 - 创建 student_scores 单科成绩表，并从 students.scores JSON 拆分回填
+"""
+import json
+
+from sqlalchemy import text
+from app.database import engine
+from app.models import StudentScore
+from app.scoring import explode_scores
+
+
+def migrate():
+    print("开始数据库迁移...")
+
+    # 创建 student_scores 表及其索引（已存在则跳过）
+    StudentScore.__table__.create(bind=engine, checkfirst=True)
+    print("✓ student_scores 表已就绪")
+
+    with engine.connect() as conn:
+        print("从 students.scores 拆分单科成绩...")
+        rows = conn.execute(text("SELECT id, scores FROM students")).fetchall()
+        params = []
+        for student_id, raw_scores in rows:
+            scores = json.loads(raw_scores) if isinstance(raw_scores, str) else raw_scores
+            for subject, score in explode_scores(scores):
+                params.append({"student_id": student_id, "subject": subject, "score": score})
+
+        # 整表重建，保证脚本可重复执行
+        conn.execute(text("DELETE FROM student_scores"))
+        if params:
+            conn.execute(
+                text(
+                    "INSERT INTO student_scores (student_id, subject, score) "
+                    "VALUES (:student_id, :subject, :score)"
+                ),
+                params,
+            )
+        conn.commit()
+        print(f"✓ 已写入 {len(params)} 条单科成绩（{len(rows)} 名学生记录）")
+
+    print("数据库迁移完成！")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,22 @@
+"""
+数据库迁移脚本 - 为 students 表添加 (student_no, exam_date, created_at) 复合索引，支持按考试日期读取学生成绩走势
+"""
+from sqlalchemy import text
+from app.database import engine
+
+
+def migrate():
+    print("开始数据库迁移...")
+
+    with engine.connect() as conn:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_students_student_no_exam_date "
+            "ON students (student_no, exam_date, created_at)"
+        ))
+        conn.commit()
+    print("✓ students 走势索引已就绪")
+
+    print("数据库迁移完成！")
+
+if __name__ == "__main__":
+    migrate()